@@ -0,0 +1,32 @@
+"""Backfill Torrent attr: qbit_node
+
+Revision ID: 7c3e91b2d4a6
+Revises: e4d19b6f7a30
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import config
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e91b2d4a6'
+down_revision: Union[str, None] = 'e4d19b6f7a30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Torrents added before the instances were sharded are downloading on the single instance there was.
+    op.execute(
+        sa.text("UPDATE torrent SET qbit_node = :node WHERE qbit_node IS NULL AND is_processing")
+        .bindparams(node=config.QBITTORRENT_CLIENT_DSN)
+    )
+
+
+def downgrade() -> None:
+    pass
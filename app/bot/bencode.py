@@ -0,0 +1,226 @@
+import hashlib
+from functools import cached_property
+from typing import Any, Iterator
+
+
+class BencodeError(ValueError):
+    pass
+
+
+def _read_string_span(raw: bytes, pos: int) -> tuple[int, int]:
+    colon = raw.index(b":", pos)
+    length = raw[pos:colon]
+    if not length.isdigit():  # int() would take a sign, moving the position backwards.
+        raise BencodeError(f"Invalid string length at {pos}")
+    start = colon + 1
+    end = start + int(length)
+    if end > len(raw):
+        raise BencodeError(f"String at {pos} runs past the end of data")
+    return start, end
+
+
+def _expect(value: Any, type_: type | tuple[type, ...], what: str) -> Any:
+    if not isinstance(value, type_) or isinstance(value, bool):
+        raise BencodeError(f"Unexpected type of {what}: {type(value).__name__}")
+    return value
+
+
+def _length(value: Any) -> int:
+    if _expect(value, int, "length") < 0:
+        raise BencodeError(f"Negative length: {value}")
+    return value
+
+
+def _skip(raw: bytes, pos: int) -> int:
+    """Return the position right after the value starting at `pos` without decoding it."""
+    index = raw.index
+    depth = 0
+    while True:
+        char = raw[pos]
+        if char == 100 or char == 108:  # d, l
+            depth += 1
+            pos += 1
+            continue
+        if char == 101:  # e
+            depth -= 1
+            pos += 1
+        elif char == 105:  # i
+            pos = index(b"e", pos) + 1
+        else:
+            pos = _read_string_span(raw, pos)[1]
+        if depth == 0:
+            return pos
+
+
+def _decode(raw: bytes, pos: int) -> tuple[Any, int]:
+    char = raw[pos]
+    if 48 <= char <= 57:  # A string.
+        start, end = _read_string_span(raw, pos)
+        return raw[start:end], end
+    if char == 105:  # i
+        end = raw.index(b"e", pos)
+        return int(raw[pos + 1:end]), end + 1
+    if char == 108:  # l
+        items, pos = [], pos + 1
+        while raw[pos] != 101:
+            item, pos = _decode(raw, pos)
+            items.append(item)
+        return items, pos + 1
+    if char == 100:  # d
+        items, pos = {}, pos + 1
+        while raw[pos] != 101:
+            start, pos = _read_string_span(raw, pos)  # Keys are strings, anything else is malformed.
+            items[raw[start:pos]], pos = _decode(raw, pos)
+        return items, pos + 1
+    raise BencodeError(f"Unexpected byte {chr(char)!r} at {pos}")
+
+
+def _dict_spans(raw: bytes, pos: int) -> dict[bytes, tuple[int, int]]:
+    """Map every key of the dict starting at `pos` to the byte span of its value."""
+    if raw[pos] != 100:
+        raise BencodeError(f"Expected a dict at {pos}")
+    spans, pos = {}, pos + 1
+    while raw[pos] != 101:
+        start, end = _read_string_span(raw, pos)
+        key = raw[start:end]
+        value_end = _skip(raw, end)
+        if value_end <= pos:
+            raise BencodeError(f"No progress at {pos}")
+        spans[key] = (end, value_end)
+        pos = value_end
+    return spans
+
+
+def encode(value: Any) -> bytes:
+    chunks = []
+
+    def _encode(value: Any) -> None:
+        if isinstance(value, bool) or not isinstance(value, (int, str, bytes, list, tuple, dict)):
+            raise BencodeError(f"Can't bencode {type(value).__name__}")
+        if isinstance(value, int):
+            chunks.append(b"i%de" % value)
+        elif isinstance(value, (str, bytes)):
+            value = value.encode() if isinstance(value, str) else value
+            chunks.append(b"%d:" % len(value))
+            chunks.append(value)
+        elif isinstance(value, (list, tuple)):
+            chunks.append(b"l")
+            for item in value:
+                _encode(item)
+            chunks.append(b"e")
+        else:
+            chunks.append(b"d")
+            items = ((key.encode() if isinstance(key, str) else key, item) for key, item in value.items())
+            for key, item in sorted(items):
+                _encode(key)
+                _encode(item)
+            chunks.append(b"e")
+
+    _encode(value)
+    return b"".join(chunks)
+
+
+class Metainfo:
+    """Lazy reader of a torrent file.
+
+    Only the top-level and the `info` dicts are indexed: values are decoded on access, the info
+    hash is computed over the original bytes of the `info` value (no re-encoding) and the
+    `pieces` blob is never copied.
+    """
+
+    def __init__(self, data: bytes | bytearray | memoryview):
+        """Index the torrent. Raise `BencodeError` if it's malformed, including values of a wrong type."""
+        self._raw = bytes(data) if isinstance(data, memoryview) else data
+        self._view = memoryview(self._raw)
+        try:
+            self._spans = _dict_spans(self._raw, 0)
+            if b"info" not in self._spans:
+                raise BencodeError("No info dict in the torrent")
+            self._info_spans = _dict_spans(self._raw, self._spans[b"info"][0])
+        except (IndexError, ValueError) as e:
+            raise BencodeError(str(e)) from e
+
+    @property
+    def info_span(self) -> tuple[int, int]:
+        return self._spans[b"info"]
+
+    @property
+    def raw_info(self) -> memoryview:
+        start, end = self.info_span
+        return self._view[start:end]
+
+    @cached_property
+    def info_hash(self) -> str:
+        return hashlib.sha1(self.raw_info).hexdigest()
+
+    def get(self, key: bytes, default: Any = None) -> Any:
+        return self._decode_span(self._spans, key, default)
+
+    def get_info(self, key: bytes, default: Any = None) -> Any:
+        return self._decode_span(self._info_spans, key, default)
+
+    @cached_property
+    def name(self) -> str:
+        name = self.get_info(b"name.utf-8") or self.get_info(b"name", b"")
+        return _expect(name, bytes, "name").decode(errors="replace")
+
+    @property
+    def trackers(self) -> list[str]:
+        announce_list = self.get(b"announce-list")
+        if announce_list:
+            return [
+                _expect(tracker, bytes, "tracker").decode(errors="replace")
+                for tier in _expect(announce_list, list, "announce-list")
+                for tracker in _expect(tier, list, "tracker tier")
+            ]
+        announce = self.get(b"announce")
+        return [_expect(announce, bytes, "announce").decode(errors="replace")] if announce else []
+
+    @property
+    def magnet_link(self) -> str:
+        magnet_link = f"magnet:?xt=urn:btih:{self.info_hash}"
+        for tracker in self.trackers:
+            magnet_link += f"&tr={tracker}"
+        return magnet_link
+
+    def iter_files(self) -> Iterator[dict]:
+        """Yield files the way qBittorrent's `torrents/files` lists them.
+
+        Padding files are skipped and names of multi-file torrents are prefixed with the
+        torrent name. Entries are decoded one at a time, the whole list is never built.
+        """
+        if b"files" not in self._info_spans:
+            yield {"index": 0, "name": self.name, "size": _length(self.get_info(b"length"))}
+            return
+        pos = self._info_spans[b"files"][0]
+        if self._raw[pos] != 108:
+            raise BencodeError("The file list is not a list")
+        pos += 1
+        index = 0
+        try:
+            while self._raw[pos] != 101:
+                file_, pos = _decode(self._raw, pos)  # File entries are small, decoding them whole is cheapest.
+                _expect(file_, dict, "file entry")
+                if b"p" in _expect(file_.get(b"attr", b""), bytes, "attr"):
+                    continue
+                path = _expect(file_.get(b"path.utf-8") or file_[b"path"], list, "path")
+                parts = (_expect(part, bytes, "path part").decode(errors="replace") for part in path)
+                file_name = "/".join([self.name, *parts])
+                yield {"index": index, "name": file_name, "size": _length(file_[b"length"])}
+                index += 1
+        except (IndexError, KeyError, ValueError) as e:
+            raise BencodeError(f"Malformed file list: {e}") from e
+
+    def _decode_span(self, spans: dict[bytes, tuple[int, int]], key: bytes, default: Any = None) -> Any:
+        if key not in spans:
+            return default
+        try:
+            return _decode(self._raw, spans[key][0])[0]
+        except (IndexError, ValueError) as e:
+            raise BencodeError(f"Malformed value of {key!r}: {e}") from e
+
+
+def build_torrent_file(raw_info: bytes, trackers: list[str]) -> bytes:
+    """Wrap the original bytes of an info dict into a torrent file, keeping its info hash."""
+    head = encode({"announce-list": [[tracker] for tracker in trackers]}) if trackers else b"de"
+    return head[:-1] + b"4:info" + bytes(raw_info) + b"e"
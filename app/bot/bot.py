@@ -9,6 +9,7 @@ from telegram.ext import (CallbackQueryHandler, CommandHandler,
 from telegram.request import HTTPXRequest
 
 from app.common.messages import Messages, error_messages
+from app.bot.bencode import BencodeError
 from app.bot.service import BotService, bot_service
 from app.config import config
 from app.bot.structures import FileIDIndexPathSize
@@ -74,6 +75,7 @@ class MainBot:
                 return
             magnet_link = message.text
             info_hash = None
+            torrent_meta = None
             await update.message.reply_text(Messages.link_received)
         elif message.document:
             is_allowed_to_add_torrent = await self._bot_svc.is_user_allowed_to_add_more_torrents(tg_user_id)
@@ -84,7 +86,12 @@ class MainBot:
             file = await message.document.get_file()
             byte_array = await file.download_as_bytearray()
             byte_stream = BytesIO(byte_array)
-            info_hash, magnet_link = self._bot_svc.generate_hash_and_magnet_link_from_file(byte_stream)
+            try:
+                torrent_meta = self._bot_svc.parse_torrent_file(byte_stream)
+            except BencodeError:
+                await update.message.reply_text(Messages.invitation_after_error)
+                return
+            info_hash, magnet_link = torrent_meta.info_hash, torrent_meta.magnet_link
         else:
             await update.message.reply_text(Messages.invitation_after_error)
             return
@@ -93,7 +100,7 @@ class MainBot:
             if not info_hash:
                 logger.error(f"No info hash generated from magnet_link {magnet_link}")
                 return
-        invalid = await self._bot_svc.is_torrent_invalid(magnet_link, info_hash)
+        invalid = await self._bot_svc.is_torrent_invalid(magnet_link, info_hash, torrent_meta)
         if not invalid["metadata"]:
             await update.message.reply_text(Messages.torrent_metadata_ungettable)
             return
@@ -101,12 +108,13 @@ class MainBot:
             await update.message.reply_text(Messages.torrent_is_invalid)
             return
         result = await self._bot_svc.save_torrent_and_contents(
-            update.message.from_user['id'], magnet_link, info_hash
+            update.message.from_user['id'], magnet_link, info_hash, torrent_meta
         )
         if not result:
             return
         torrent, contents = result[0], result[1]
         context.user_data['torrent'] = torrent  # Here the torrent is linked to the user.
+        context.user_data['torrent_file'] = torrent_meta.raw if torrent_meta else None
         files_id_index_path = [
             FileIDIndexPathSize(
                 id=content.id, index=content.index, path=content.file_name, size=content.size
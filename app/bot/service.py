@@ -1,11 +1,9 @@
-import asyncio
-import hashlib
 import re
 from datetime import datetime
 from typing import BinaryIO
+from urllib.parse import parse_qs, urlparse
 
-import bencodepy
-from requests import HTTPError
+from httpx import HTTPStatusError
 from telegram import User as TGUser
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
@@ -13,15 +11,19 @@ from telegram.error import BadRequest
 from telegram.ext import CallbackContext
 from loguru import logger
 
-from app.torrent_client.qbittorrent import TorrentClient, torrent_client, with_relogin
+from app.torrent_client.metadata import MetadataWaiter, metadata_waiter
+from app.torrent_client.pool import TorrentClientPool, torrent_client_pool
 from app.config import config
 from app.entities.content.service import ContentService, content_service
+from app.entities.metadata.service import TorrentMetadataService, torrent_metadata_service
 from app.entities.torrent.service import TorrentService, torrent_service
 from app.entities.user.service import (UserService, user_service, UserTorrentService,
                                        user_torrent_service, UserContentService, user_content_service)
-from app.models import Content, Torrent, User
+from app.models import Content, Torrent, TorrentMetadata, User
+from app.common.cache import TTLCache
 from app.common.messages import Messages, error_messages
-from app.bot.structures import FileIDIndexPathSize
+from app.bot.bencode import Metainfo, build_torrent_file
+from app.bot.structures import FileIDIndexPathSize, TorrentMetainfo
 from app.bot.utils import shorten_path
 
 
@@ -33,11 +35,13 @@ class BotService:
     def __init__(
         self,
         content_service: ContentService = content_service,
-        torrent_client: TorrentClient = torrent_client,
+        torrent_client: TorrentClientPool = torrent_client_pool,
         torrent_service: TorrentService = torrent_service,
         user_service: UserService = user_service,
         user_torrent_service: UserTorrentService = user_torrent_service,
         user_content_service: UserContentService = user_content_service,
+        metadata_waiter: MetadataWaiter = metadata_waiter,
+        torrent_metadata_service: TorrentMetadataService = torrent_metadata_service,
     ):
         self._content_svc = content_service
         self._torrent_cli = torrent_client
@@ -45,6 +49,9 @@ class BotService:
         self._user_svc = user_service
         self._user_torrent_svc = user_torrent_service
         self._user_content_svc = user_content_service
+        self._metadata_waiter = metadata_waiter
+        self._metadata_svc = torrent_metadata_service
+        self._bad_torrents = TTLCache(maxsize=config.BAD_TORRENTS_CACHE_SIZE, ttl=config.BAD_TORRENTS_CACHE_TTL)
         self.user_selections: dict[int, set] = dict()
     
     async def is_user_allowed_to_add_more_torrents(self, user_tg_id: int) -> dict:
@@ -66,48 +73,98 @@ class BotService:
     @staticmethod
     def generate_hash_and_magnet_link_from_file(file: BinaryIO) -> tuple[str, str]:
         """Generate an info hash and a magnet link from the given torrent file."""
-        torrent_data = bencodepy.decode(file.read())
-        info = torrent_data[b"info"]
-        info_hash = hashlib.sha1(bencodepy.encode(info)).hexdigest()
-        magnet_link = f"magnet:?xt=urn:btih:{info_hash}"
-        if b"announce-list" in torrent_data:
-            for tier in torrent_data[b"announce-list"]:
-                for tracker in tier:
-                    magnet_link += f"&tr={tracker.decode()}"
-        elif b"announce" in torrent_data:
-            magnet_link += f'&tr={torrent_data[b"announce"].decode()}'
-        return info_hash, magnet_link
+        torrent_meta = BotService.parse_torrent_file(file)
+        return torrent_meta.info_hash, torrent_meta.magnet_link
+
+    @staticmethod
+    def parse_torrent_file(file: BinaryIO) -> TorrentMetainfo:
+        """Read the info hash, the magnet link and the file list straight from the torrent file.
+
+        Files are listed the way qBittorrent's `torrents/files` does (padding files skipped,
+        multi-file torrents prefixed with the torrent name), so they can be stored as contents
+        without adding the torrent to qBittorrent.
+        """
+        raw = file.read()
+        metainfo = Metainfo(raw)
+        files = list(metainfo.iter_files())
+        total_size = sum(file_["size"] for file_ in files)
+        return TorrentMetainfo(
+            metainfo.info_hash, metainfo.magnet_link, metainfo.name, total_size, files, raw, bytes(metainfo.raw_info)
+        )
     
-    async def is_torrent_invalid(self, magnet_link: str, info_hash: str) -> dict:
+    async def is_torrent_invalid(
+        self, magnet_link: str, info_hash: str, torrent_meta: TorrentMetainfo | None = None
+    ) -> dict:
         """Check if torrent meets the maximum size requirements.
         Return True if all torrent files exceed the maximum size.
         
         """
         maximum_size = config.MAXIMUM_TORRENTS_SIZE
-        self._download_from_link(magnet_link)
-        attempt = 0
-        while attempt < 12:
-            await asyncio.sleep(5)
-            torrent_files = self._torrent_cli.get_torrent_files(info_hash)
-            if torrent_files:
-                break
-            attempt += 1
-        if not torrent_files:
+        verdict = await self._get_known_bad_verdict(info_hash)
+        if verdict:
+            logger.info(f"[*] BOT SERVICE: The torrent {info_hash} is known to be bad")
+            return verdict
+        if torrent_meta:
+            metadata = await self._metadata_svc.save(
+                info_hash, torrent_meta.name, torrent_meta.total_size, torrent_meta.files, torrent_meta.raw_info
+            )
+        else:
+            metadata = await self._metadata_svc.get(info_hash) or await self._fetch_metadata(magnet_link, info_hash)
+        if not metadata:
             logger.info(f"[*] BOT SERVICE: Failed to get metadata of torrent {info_hash}")
-            self._torrent_cli.delete_permanently(info_hash)
-            return {"invalid": True, "metadata": False}
-        invalid = all((file["size"] > maximum_size for file in torrent_files))
+            verdict = {"invalid": True, "metadata": False}
+            self._bad_torrents.set(info_hash, verdict)  # Metadata may show up later, so only for a while.
+            return verdict
+        invalid = all((file["size"] > maximum_size for file in metadata.files))
         if invalid:
             logger.info(f"[*] BOT SERVICE: The torrent {info_hash} is invalid")
-            self._torrent_cli.delete_permanently(info_hash)
+            await self._torrent_svc.mark_bad({
+                'title': metadata.name,
+                'info_hash': info_hash,
+                'magnet_link': magnet_link,
+                'size': metadata.total_size,
+            })
+            self._bad_torrents.set(info_hash, {"invalid": True, "metadata": True})
         return {"invalid": invalid, "metadata": True}
 
-    @with_relogin
-    def _download_from_link(self, magnet_link: str) -> None:
-        self._torrent_cli.download_from_link(magnet_link, savepath=config.QBIT_SAVEPATH)
+    async def _get_known_bad_verdict(self, info_hash: str) -> dict | None:
+        verdict = self._bad_torrents.get(info_hash)
+        if verdict:
+            return verdict
+        torrent = await self._torrent_svc.get_by_info_hash(info_hash)
+        if torrent and torrent.is_bad:
+            verdict = {"invalid": True, "metadata": True}
+            self._bad_torrents.set(info_hash, verdict)
+            return verdict
+        return None
+
+    async def _fetch_metadata(self, magnet_link: str, info_hash: str) -> TorrentMetadata | None:
+        """Get metadata of the torrent from qBittorrent and save it to the metadata cache."""
+        existing_torrent = await self._torrent_svc.get_by_info_hash(info_hash)
+        if existing_torrent:  # It may be downloading already; another copy on another node would be orphaned.
+            self._torrent_cli.bind(info_hash, existing_torrent.qbit_node)
+        await self._download_from_link(magnet_link, info_hash)
+        try:
+            torrent_files = await self._metadata_waiter.wait(info_hash)
+            if not torrent_files:
+                return None
+            torrent_info = await self._get_torrent(info_hash)
+            return await self._metadata_svc.save(
+                info_hash, torrent_info['name'], torrent_info['total_size'], torrent_files
+            )
+        finally:
+            existing_torrent = await self._torrent_svc.get_by_info_hash(info_hash)
+            if not (existing_torrent and existing_torrent.is_processing):  # Don't stop somebody's download.
+                await self._delete_permanently(info_hash)
+
+    async def _download_from_link(self, magnet_link: str, info_hash: str) -> None:
+        await self._torrent_cli.download_from_link(magnet_link, info_hash, savepath=config.QBIT_SAVEPATH)
+
+    async def _download_from_file(self, torrent_file: bytes, info_hash: str) -> None:
+        await self._torrent_cli.download_from_file(torrent_file, info_hash, savepath=config.QBIT_SAVEPATH)
 
     async def save_torrent_and_contents(
-        self, user_tg_id: int, magnet_link: str, info_hash: str = None
+        self, user_tg_id: int, magnet_link: str, info_hash: str = None, torrent_meta: TorrentMetainfo | None = None
      ) -> tuple[Torrent, list[Content]] | None:
         if not info_hash:
             info_hash = self.extract_info_hash_from_magnet_link(magnet_link)
@@ -117,34 +174,24 @@ class BotService:
         user = await self._user_svc.get_by_tg_id(user_tg_id)
         if not user:
             return None
-        torrent_info = await self.fetch_torrent_info(info_hash)
+        metadata = torrent_meta or await self._metadata_svc.get(info_hash)
+        if not metadata:
+            logger.error(f"[!] No metadata of torrent {info_hash} found in the cache")
+            return None
         torrent = {
             'user': user,
-            'title': torrent_info['name'],
+            'title': metadata.name,
             'info_hash': info_hash,
             'magnet_link': magnet_link,
-            'size': torrent_info['total_size'],
+            'size': metadata.total_size,
         }
         torrent = await self._torrent_svc.save_or_get_existing(torrent)
         await self._user_torrent_svc.save_association(user.id, torrent.id)
-        torrent_files = self._get_torrent_files(info_hash)
-        contents = await self._content_svc.save_many_if_not_exists(torrent_files, torrent.id)
-        self._torrent_cli.delete_permanently(info_hash)
+        contents = await self._content_svc.save_many_if_not_exists(metadata.files, torrent.id)
         return torrent, contents
     
-    @with_relogin
-    def _get_torrent_files(self, info_hash: str) -> dict:
-        return self._torrent_cli.get_torrent_files(info_hash)
-
-    async def fetch_torrent_info(self, info_hash: str) -> dict:
-        existing_torrent = await self._torrent_svc.get_by_info_hash(info_hash)
-        if existing_torrent:
-            return {'name': existing_torrent.title, 'total_size': existing_torrent.size}
-        return self._get_torrent(info_hash)
-    
-    @with_relogin
-    def _get_torrent(self, info_hash: str) -> dict:
-        return self._torrent_cli.get_torrent(info_hash)
+    async def _get_torrent(self, info_hash: str) -> dict:
+        return await self._torrent_cli.get_torrent(info_hash)
 
     @staticmethod
     def extract_info_hash_from_magnet_link(magnet_link: str) -> str | None:
@@ -197,44 +244,57 @@ class BotService:
         contents: list[FileIDIndexPathSize] = context.user_data['contents']
         content_ids = [content.id for content in contents if content.path in self.user_selections[torrent.id]]
         if content_ids:
-            self._download_from_link(torrent.magnet_link)
+            torrent = await self._torrent_svc.get(torrent.id) or torrent
+            self._torrent_cli.bind(torrent.hash, torrent.qbit_node)  # The torrent may be downloading already.
+            torrent_file = context.user_data.get('torrent_file') or await self._build_torrent_file(torrent)
+            if torrent_file:
+                await self._download_from_file(torrent_file, torrent.hash)  # No DHT metadata fetch needed.
+            else:
+                await self._download_from_link(torrent.magnet_link, torrent.hash)
             discarded_file_indexes = [  # The files the user doesn't want to download.
                 content.index for content in contents if not content.path in self.user_selections[torrent.id]
             ]
-            await asyncio.sleep(1)
             priority_set = await self._set_files_priority(discarded_file_indexes, torrent.hash)
             if not priority_set:
                 logger.debug(f"[?] Failed to set priority for torrent {torrent.id}, user {user.id}")
             for content_id in content_ids:
                 await self._user_content_svc.save_association(user.id, content_id)
             updated_torrent = await self._torrent_svc.update_torrent(
-                {'is_task_sent': True, 'task_sent_at': datetime.now().replace(microsecond=0), 'is_processing': True},
+                {
+                    'is_task_sent': True,
+                    'task_sent_at': datetime.now().replace(microsecond=0),
+                    'is_processing': True,
+                    'qbit_node': self._torrent_cli.node_of(torrent.hash),
+                },
                 torrent.id
             )
             logger.debug(f'Torrent sent to download: id {torrent.id}.')
     
-    async def _set_files_priority(self,discarded_file_indexes: list[int], torrent_hash: str) -> bool:
-        max_retries = 30
-        retry_delay = 2
+    async def _build_torrent_file(self, torrent: Torrent) -> bytes | None:
+        """Rebuild the torrent file from the cached info dict, if there is one."""
+        metadata = await self._metadata_svc.get(torrent.hash)
+        if not (metadata and metadata.raw_info):
+            return None
+        trackers = parse_qs(urlparse(torrent.magnet_link).query).get('tr', [])
+        return build_torrent_file(metadata.raw_info, trackers)
+
+    async def _set_files_priority(self, discarded_file_indexes: list[int], torrent_hash: str) -> bool:
+        """Skip the discarded files with a single request once the torrent metadata is ready."""
+        if not discarded_file_indexes:
+            return True
+        max_retries = 3
         for attempt in range(max_retries):
-            failed = False
-            for idx in discarded_file_indexes:
-                try:
-                    self._set_file_priority(torrent_hash, idx)
-                except HTTPError:
-                    failed = True
-                    break
-            if not failed:
-                break
-            else:
-                await asyncio.sleep(retry_delay)
-        else:
-            return False
-        return True
-    
-    @with_relogin
-    def _set_file_priority(self, torrent_hash: str, idx: int, priority: int = 0) -> None:
-        return self._torrent_cli.set_file_priority(torrent_hash, idx, priority)
+            if not await self._metadata_waiter.wait(torrent_hash):
+                return False
+            try:
+                await self._set_priority_of_files(torrent_hash, discarded_file_indexes)
+            except HTTPStatusError:
+                continue
+            return True
+        return False
+
+    async def _set_priority_of_files(self, torrent_hash: str, indexes: list[int], priority: int = 0) -> None:
+        return await self._torrent_cli.set_files_priority(torrent_hash, indexes, priority)
 
     async def set_user_unblocked(self, user_tg_id: int) -> dict:
         user = await self._user_svc.get_by_tg_id(user_tg_id)
@@ -295,12 +355,12 @@ class BotService:
             logger.info(f"[*] Removed contents of torrent {torrent_id}")
             torrent = await self._torrent_svc.get(torrent_id)
             if torrent:
-                self._delete_permanently(torrent.hash)
+                self._torrent_cli.bind(torrent.hash, torrent.qbit_node)
+                await self._delete_permanently(torrent.hash)
                 await self._torrent_svc.update_torrent({"is_processing": False}, torrent_id)
     
-    @with_relogin
-    def _delete_permanently(self, torrent_hash: str) -> None:
-        return self._torrent_cli.delete_permanently(torrent_hash)
+    async def _delete_permanently(self, torrent_hash: str) -> None:
+        return await self._torrent_cli.delete_permanently(torrent_hash)
 
 
 bot_service = BotService()
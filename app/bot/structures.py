@@ -1,3 +1,5 @@
 from collections import namedtuple
 
 FileIDIndexPathSize = namedtuple('FileIDIndexPath', 'id, index, path, size')
+
+TorrentMetainfo = namedtuple('TorrentMetainfo', 'info_hash, magnet_link, name, total_size, files, raw, raw_info')
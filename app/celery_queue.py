@@ -9,6 +9,9 @@ celery_app = Celery("worker", broker=config.amqp_dsn, include=["app.tasks.tasks"
 celery_app.conf.worker_pool_restarts = True
 celery_app.conf.broker_connection_retry_on_startup = True
 celery_app.conf.broker_heartbeat = 0
+# Uploads are served by workers of their own, so a long drain of the dispatch ledger doesn't hold
+# the watchdog back. The queue is declared on first use with an exchange and routing key of its name.
+celery_app.conf.task_routes = {"app.tasks.upload_task.upload_downloaded_contents": {"queue": "uploads"}}
 
 celery_app.conf.beat_schedule = {
     **ScheduledTasks.watchdog_tasks,
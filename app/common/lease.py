@@ -0,0 +1,42 @@
+import hashlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import engine
+
+
+class AdvisoryLock:
+    """A Postgres session-level advisory lock, named by a string.
+
+    The lock is held on a dedicated connection for the length of the `hold()` block, so it's
+    released by Postgres itself if the process holding it dies.
+    """
+
+    def __init__(self, name: str, engine: AsyncEngine = engine):
+        self._name = name
+        self._key = int.from_bytes(hashlib.sha1(name.encode()).digest()[:8], 'big', signed=True)
+        self._engine = engine
+
+    @asynccontextmanager
+    async def hold(self, wait: bool = False) -> AsyncIterator[bool]:
+        """Acquire the lock for the block and yield whether it was acquired.
+
+        Without `wait`, yield False at once if the lock is held elsewhere.
+        """
+        async with self._engine.connect() as connection:
+            if wait:
+                await connection.execute(sa.select(sa.func.pg_advisory_lock(self._key)))
+                acquired = True
+            else:
+                result = await connection.execute(sa.select(sa.func.pg_try_advisory_lock(self._key)))
+                acquired = bool(result.scalar())
+            await connection.commit()  # Don't keep a transaction open while the lock is held.
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    await connection.execute(sa.select(sa.func.pg_advisory_unlock(self._key)))
+                    await connection.commit()
@@ -29,13 +29,35 @@ class Config(BaseSettings):
     TELEGRAM_API_HASH: str
     TELEGRAM_BOT_URL: str
     QBITTORRENT_CLIENT_DSN: str = "http://localhost:8080"
+    QBITTORRENT_CLIENT_DSNS: list[str] = []  # Several instances to shard torrents between.
+    QBITTORRENT_PLACEMENT: Literal['hash', 'load'] = 'hash'
+    QBITTORRENT_HOST_SAVEPATHS: dict[str, str] = {}  # Instance DSN -> its HOST_SAVEPATH.
     QBITTORRENT_AUTH_USER: str = "admin"
     QBITTORRENT_AUTH_PASS: SecretStr
+    QBITTORRENT_SESSION_TTL: int = 3000  # Seconds; qBittorrent drops idle sessions after 3600 by default.
     QBIT_SAVEPATH: str
     HOST_SAVEPATH: str
+    ARCHIVE_SCRATCH_DIR: str = ""  # Archives that can't be streamed; next to HOST_SAVEPATH by default.
+    ARCHIVE_WORKERS: int = 4  # Threads compressing archive members.
+    ARCHIVE_DEFLATE_MAX_SIZE: int = 67108864  # 64 MB; larger members are stored.
     FILES_PER_PAGE: int
     MAXIMUM_TORRENTS_SIZE: int = 2147000000  # Approx. 2GB.
     MAXIMUM_ACTIVE_TORRENTS: int = 3
+    WATCHDOG_SYNC_MODE: bool = True
+    WATCHDOG_CONCURRENCY: int = 8  # Torrents checked at once.
+    WATCHDOG_TICK_INTERVAL: int = 15  # Seconds; the shortest interval between checks of a torrent.
+    WATCHDOG_SWEEP_INTERVAL: int = 300  # Seconds; the longest one, for stalled and completed torrents.
+    WATCHDOG_PARTIAL_INTERVAL: int = 60  # Seconds; with several selected files downloading or no ETA.
+    COMPLETION_HOOK_HOST: str = "0.0.0.0"
+    COMPLETION_HOOK_PORT: int = 8099
+    TORRENT_METADATA_CACHE_SIZE: int = 10000
+    TORRENT_METADATA_RAW_INFO_MAX_SIZE: int = 1048576  # 1 MB.
+    BAD_TORRENTS_CACHE_SIZE: int = 10000
+    BAD_TORRENTS_CACHE_TTL: int = 3600  # Seconds.
+    UPLOAD_DISPATCH_LEASE: int = 3600  # Seconds after which an unfinished upload is dispatched again.
+    UPLOAD_DISPATCH_MAX_ATTEMPTS: int = 3
+    UPLOAD_CONCURRENCY: int = 3  # Uploads run at once by a worker.
+    UPLOAD_AGING_RATE: int = 1048576  # Bytes an upload's size is discounted by per second it waits.
 
     @property
     def postgres_dsn(self) -> str:
@@ -55,6 +77,19 @@ class Config(BaseSettings):
     def is_dev_mode(self) -> bool:
         return self.MODE == "DEV"
     
+    @property
+    def qbittorrent_client_dsns(self) -> list[str]:
+        return self.QBITTORRENT_CLIENT_DSNS or [self.QBITTORRENT_CLIENT_DSN]
+
+    def host_savepath(self, qbittorrent_node: str | None = None) -> str:
+        return self.QBITTORRENT_HOST_SAVEPATHS.get(qbittorrent_node, self.HOST_SAVEPATH)
+    
+    @property
+    def archive_scratch_dir(self) -> str:
+        if self.ARCHIVE_SCRATCH_DIR:
+            return self.ARCHIVE_SCRATCH_DIR
+        return os.path.join(os.path.dirname(self.HOST_SAVEPATH.rstrip('/')), 'archives')
+    
     @property
     def qbittorrent_auth_pass(self):
         return self.QBITTORRENT_AUTH_PASS.get_secret_value()
@@ -1,10 +1,13 @@
 from typing import Sequence
 
-from sqlalchemy import insert, select
+import sqlalchemy as sa
+from sqlalchemy import insert, select, update
 
 from app.dao import BaseDAO
 from app.models import Content
 
+MARK_READY_CHUNK_SIZE = 10000  # 3 parameters a record; asyncpg takes at most 32767 in a statement.
+
 
 class ContentDAO(BaseDAO):
     model = Content
@@ -24,3 +27,30 @@ class ContentDAO(BaseDAO):
         query = select(cls.model).where(cls.model.id.in_(ids))
         result = await cls._execute_query(query)
         return result.scalars().all()
+
+    @classmethod
+    async def mark_ready_many(cls, records: Sequence[tuple[int, int, str]]) -> Sequence[model]:
+        """Set `ready` and the save paths of many contents, in one statement per `MARK_READY_CHUNK_SIZE`.
+
+        `records` are (torrent_id, index, save_path) triples, joined to the table as VALUES.
+        Marking is idempotent, so chunks already done are harmless should a later one fail.
+        """
+        cls._check_model()
+        records = list(records)
+        contents = []
+        for start in range(0, len(records), MARK_READY_CHUNK_SIZE):
+            values = sa.values(
+                sa.column('torrent_id', sa.Integer),
+                sa.column('index', sa.Integer),
+                sa.column('save_path', sa.Text),
+                name='ready_content',
+            ).data(records[start:start + MARK_READY_CHUNK_SIZE])
+            query = (
+                update(cls.model)
+                .where(cls.model.torrent_id == values.c.torrent_id, cls.model.index == values.c.index)
+                .values(save_path=values.c.save_path, ready=True)
+                .returning(cls.model)
+            )
+            result = await cls._execute_query(query)
+            contents.extend(result.scalars().all())
+        return contents
@@ -24,6 +24,9 @@ class ContentManager:
     async def update(self, data: dict, torrent_id: int, index: int) -> Content:
         return await self._dao.update(data, torrent_id=torrent_id, index=index)
     
+    async def mark_ready_many(self, records: list[tuple[int, int, str]]) -> list[Content]:
+        return await self._dao.mark_ready_many(records)
+    
     async def delete_many(self, filter_by: dict) -> int:
         return await self._dao.delete(**filter_by)
 
@@ -36,6 +36,12 @@ class ContentService:
     async def update(self, data: dict, torrent_id: int, index: int) -> Content:
         return await self._content_mng.update(data, torrent_id, index)
     
+    async def mark_ready(self, torrent_id: int, save_paths: dict[int, str]) -> list[Content]:
+        """Mark the contents of the torrent ready, given their save paths by file index."""
+        return await self._content_mng.mark_ready_many(
+            [(torrent_id, index, save_path) for index, save_path in save_paths.items()]
+        )
+    
     async def delete_by_torrent_id(self, torrent_id: int) -> int:
         return await self._content_mng.delete_many({"torrent_id": torrent_id})
 
@@ -0,0 +1,29 @@
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.dao import BaseDAO
+from app.models import TorrentMetadata
+
+
+class TorrentMetadataDAO(BaseDAO):
+    model = TorrentMetadata
+
+    @classmethod
+    async def upsert(cls, **values) -> TorrentMetadata:
+        cls._check_model()
+        query = insert(cls.model).values(**values)
+        query = query.on_conflict_do_update(
+            index_elements=[cls.model.info_hash],
+            set_={key: query.excluded[key] for key in values if key != 'info_hash'},
+        ).returning(cls.model)
+        result = await cls._execute_query(query)
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def delete_least_recently_used(cls, keep: int) -> int:
+        """Delete all records but the `keep` most recently used ones."""
+        cls._check_model()
+        to_keep = select(cls.model.id).order_by(cls.model.last_used_at.desc()).limit(keep)
+        query = delete(cls.model).where(cls.model.id.not_in(to_keep.scalar_subquery()))
+        result = await cls._execute_query(query)
+        return result.rowcount
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from app.entities.metadata.dao import TorrentMetadataDAO
+from app.models import TorrentMetadata
+
+
+class TorrentMetadataManager:
+    def __init__(self, dao: TorrentMetadataDAO = TorrentMetadataDAO):
+        self._dao = dao
+
+    async def save(self, metadata: dict) -> TorrentMetadata:
+        return await self._dao.upsert(**metadata, last_used_at=datetime.now().replace(microsecond=0))
+
+    async def touch(self, info_hash: str) -> TorrentMetadata | None:
+        return await self._dao.update({'last_used_at': datetime.now().replace(microsecond=0)}, info_hash=info_hash)
+
+    async def evict(self, keep: int) -> int:
+        return await self._dao.delete_least_recently_used(keep)
+
+
+torrent_metadata_manager = TorrentMetadataManager()
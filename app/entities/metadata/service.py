@@ -0,0 +1,42 @@
+from loguru import logger
+
+from app.config import config
+from app.entities.metadata.manager import TorrentMetadataManager, torrent_metadata_manager
+from app.models import TorrentMetadata
+
+
+class TorrentMetadataService:
+    """Durable cache of torrents metadata keyed by info hash.
+
+    A torrent sent again after its contents were removed is validated and shown to the user
+    from the cache, without adding it to qBittorrent. The least recently used records are
+    evicted once the cache grows over `TORRENT_METADATA_CACHE_SIZE`.
+    """
+
+    def __init__(self, torrent_metadata_manager: TorrentMetadataManager = torrent_metadata_manager):
+        self._metadata_mng = torrent_metadata_manager
+        self._max_size = config.TORRENT_METADATA_CACHE_SIZE
+        self._raw_info_max_size = config.TORRENT_METADATA_RAW_INFO_MAX_SIZE
+
+    async def get(self, info_hash: str) -> TorrentMetadata | None:
+        return await self._metadata_mng.touch(info_hash)
+
+    async def save(
+        self, info_hash: str, name: str, total_size: int, files: list[dict], raw_info: bytes | None = None
+    ) -> TorrentMetadata:
+        if raw_info is not None and len(raw_info) > self._raw_info_max_size:
+            raw_info = None
+        metadata = await self._metadata_mng.save({
+            'info_hash': info_hash,
+            'name': name,
+            'total_size': total_size,
+            'files': [{'index': file['index'], 'name': file['name'], 'size': file['size']} for file in files],
+            'raw_info': raw_info,
+        })
+        evicted = await self._metadata_mng.evict(self._max_size)
+        if evicted:
+            logger.debug(f"[*] METADATA CACHE: Evicted {evicted} records")
+        return metadata
+
+
+torrent_metadata_service = TorrentMetadataService()
@@ -0,0 +1,35 @@
+from datetime import datetime
+from typing import Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.dao import BaseDAO
+from app.models import KnownPeer
+
+
+class KnownPeerDAO(BaseDAO):
+    model = KnownPeer
+
+    @classmethod
+    async def upsert_many(cls, records: Sequence[dict]) -> int:
+        cls._check_model()
+        if not records:
+            return 0
+        query = insert(cls.model).values(list(records))
+        query = query.on_conflict_do_update(
+            index_elements=[cls.model.account_id, cls.model.tg_id],
+            set_={
+                'last_seen_at': query.excluded.last_seen_at,
+                'dialog_date': func.coalesce(query.excluded.dialog_date, cls.model.dialog_date),
+            },
+        )
+        result = await cls._execute_query(query)
+        return result.rowcount
+
+    @classmethod
+    async def fetch_latest_dialog_date(cls, account_id: int) -> datetime | None:
+        cls._check_model()
+        query = select(func.max(cls.model.dialog_date)).where(cls.model.account_id == account_id)
+        result = await cls._execute_query(query)
+        return result.scalar_one_or_none()
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from app.entities.peer.dao import KnownPeerDAO
+from app.models import KnownPeer
+
+
+class KnownPeerManager:
+    def __init__(self, dao: KnownPeerDAO = KnownPeerDAO):
+        self._dao = dao
+
+    async def get(self, account_id: int, tg_id: int) -> KnownPeer | None:
+        return await self._dao.find_one_or_none(account_id=account_id, tg_id=tg_id)
+
+    async def save_many(self, account_id: int, peers: dict[int, datetime | None]) -> int:
+        now = datetime.now().replace(microsecond=0)
+        return await self._dao.upsert_many([
+            {'account_id': account_id, 'tg_id': tg_id, 'dialog_date': dialog_date, 'last_seen_at': now}
+            for tg_id, dialog_date in peers.items()
+        ])
+
+    async def get_latest_dialog_date(self, account_id: int) -> datetime | None:
+        return await self._dao.fetch_latest_dialog_date(account_id)
+
+
+known_peer_manager = KnownPeerManager()
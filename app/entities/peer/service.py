@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from app.entities.peer.manager import KnownPeerManager, known_peer_manager
+
+
+class KnownPeerService:
+    """Persisted index of the users the uploader account can send files to, by account.
+
+    Peers come from the private dialogs of the account, recorded with the date of their last
+    message, and from single resolved peers, recorded without one. The latest dialog date is
+    the offset the next scan of dialogs stops at.
+    """
+
+    def __init__(self, known_peer_manager: KnownPeerManager = known_peer_manager):
+        self._known_peer_mng = known_peer_manager
+
+    async def is_known(self, account_id: int, tg_id: int) -> bool:
+        return await self._known_peer_mng.get(account_id, tg_id) is not None
+
+    async def save(self, account_id: int, tg_id: int) -> None:
+        await self._known_peer_mng.save_many(account_id, {tg_id: None})
+
+    async def save_from_dialogs(self, account_id: int, peers: dict[int, datetime | None]) -> int:
+        return await self._known_peer_mng.save_many(account_id, peers)
+
+    async def get_scan_offset(self, account_id: int) -> datetime | None:
+        return await self._known_peer_mng.get_latest_dialog_date(account_id)
+
+
+known_peer_service = KnownPeerService()
@@ -0,0 +1,19 @@
+from sqlalchemy.dialects.postgresql import insert
+
+from app.dao import BaseDAO
+from app.models import TelegramFile
+
+
+class TelegramFileDAO(BaseDAO):
+    model = TelegramFile
+
+    @classmethod
+    async def upsert(cls, **values) -> TelegramFile:
+        cls._check_model()
+        query = insert(cls.model).values(**values)
+        query = query.on_conflict_do_update(
+            index_elements=[cls.model.cache_key],
+            set_={key: query.excluded[key] for key in values if key != 'cache_key'},
+        ).returning(cls.model)
+        result = await cls._execute_query(query)
+        return result.scalar_one_or_none()
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from app.entities.telegram_file.dao import TelegramFileDAO
+from app.models import TelegramFile
+
+
+class TelegramFileManager:
+    def __init__(self, dao: TelegramFileDAO = TelegramFileDAO):
+        self._dao = dao
+
+    async def get(self, cache_key: str) -> TelegramFile | None:
+        return await self._dao.find_one_or_none(cache_key=cache_key)
+
+    async def save(self, cache_key: str, file_id: str, account_id: int) -> TelegramFile:
+        return await self._dao.upsert(
+            cache_key=cache_key, file_id=file_id, account_id=account_id, created_at=datetime.now().replace(microsecond=0)
+        )
+
+    async def delete(self, cache_key: str) -> int:
+        return await self._dao.delete(cache_key=cache_key)
+
+
+telegram_file_manager = TelegramFileManager()
@@ -0,0 +1,43 @@
+import hashlib
+
+from loguru import logger
+
+from app.entities.telegram_file.manager import TelegramFileManager, telegram_file_manager
+from app.models import Content, TelegramFile, Torrent
+
+
+class TelegramFileService:
+    """Durable cache of the Telegram `file_id`s of the uploaded files.
+
+    A file already uploaded for one user is sent to the next ones by its `file_id`, without
+    uploading it again. The key is the content identity: info hash, file index and size for a
+    single file, the set of those for an archive. A `file_id` is only valid for the account
+    that uploaded it, so the entries of another account are dropped on lookup.
+    """
+
+    def __init__(self, telegram_file_manager: TelegramFileManager = telegram_file_manager):
+        self._telegram_file_mng = telegram_file_manager
+
+    @staticmethod
+    def cache_key(torrent: Torrent, contents: list[Content]) -> str:
+        if len(contents) == 1:
+            return f'{torrent.hash}:{contents[0].index}:{contents[0].size}'
+        members = ','.join(f'{content.index}:{content.size}' for content in sorted(contents, key=lambda c: c.index))
+        return f'zip:{torrent.hash}:{hashlib.sha1(members.encode()).hexdigest()}'
+
+    async def get(self, cache_key: str, account_id: int) -> TelegramFile | None:
+        telegram_file = await self._telegram_file_mng.get(cache_key)
+        if telegram_file is not None and telegram_file.account_id != account_id:
+            logger.info(f"[*] TELEGRAM FILES: {cache_key} was uploaded by another account, dropped")
+            await self.invalidate(cache_key)
+            return None
+        return telegram_file
+
+    async def save(self, cache_key: str, file_id: str, account_id: int) -> TelegramFile:
+        return await self._telegram_file_mng.save(cache_key, file_id, account_id)
+
+    async def invalidate(self, cache_key: str) -> None:
+        await self._telegram_file_mng.delete(cache_key)
+
+
+telegram_file_service = TelegramFileService()
@@ -1,6 +1,22 @@
+from sqlalchemy import select
+
 from app.dao import BaseDAO
-from app.models import Torrent
+from app.models import Torrent, User, user_torrent_association
 
 
 class TorrentDAO(BaseDAO):
     model = Torrent
+
+    @classmethod
+    async def fetch_processing_with_users(cls, info_hashes: list[str] | None = None) -> list[tuple[Torrent, User]]:
+        query = (
+            select(cls.model, User)
+            .join(user_torrent_association, user_torrent_association.c.torrent_id == cls.model.id)
+            .join(User, User.id == user_torrent_association.c.user_id)
+            .where(cls.model.is_processing.is_(True))
+            .order_by(cls.model.id)
+        )
+        if info_hashes is not None:
+            query = query.where(cls.model.hash.in_(info_hashes))
+        result = await cls._execute_query(query)
+        return result.all()
@@ -1,6 +1,6 @@
 from app.entities.torrent.dao import TorrentDAO
 from app.entities.torrent.schema import TorrentSaveSchema
-from app.models import Torrent
+from app.models import Torrent, User
 
 
 class TorrentManager:
@@ -13,6 +13,7 @@ class TorrentManager:
             hash=torrent['info_hash'],
             magnet_link=torrent['magnet_link'],
             size=torrent['size'],
+            is_bad=torrent.get('is_bad', False),
         )
         return await self._dao.insert(**torrent.model_dump())
     
@@ -25,6 +26,9 @@ class TorrentManager:
     async def get_many(self, data: dict) -> list[Torrent]:
         return await self._dao.find_all(**data)
     
+    async def get_processing_with_users(self, info_hashes: list[str] | None = None) -> list[tuple[Torrent, User]]:
+        return await self._dao.fetch_processing_with_users(info_hashes)
+    
     async def update(self, data: dict, torrent_id: int) -> Torrent:
         return await self._dao.update(data, id=torrent_id)
 
@@ -8,3 +8,4 @@ class TorrentSaveSchema(BaseModel):
     hash: str
     magnet_link: str
     size: int
+    is_bad: bool = False
@@ -1,5 +1,5 @@
 from app.entities.torrent.manager import TorrentManager, torrent_manager
-from app.models import Torrent
+from app.models import Torrent, User
 
 
 class TorrentService:
@@ -18,12 +18,23 @@ class TorrentService:
             torrent_ = await self._torrent_mng.save(torrent)
         return torrent_
     
+    async def mark_bad(self, torrent: dict) -> Torrent:
+        """Remember that the torrent can't be downloaded. Its contents never change, so it's for good."""
+        torrent_ = await self._torrent_mng.get_by_info_hash(torrent['info_hash'])
+        if not torrent_:
+            return await self._torrent_mng.save({**torrent, 'is_bad': True})
+        return await self._torrent_mng.update({'is_bad': True}, torrent_.id)
+    
     async def get_by_info_hash(self, info_hash: str) -> Torrent | None:
         return await self._torrent_mng.get_by_info_hash(info_hash)
     
     async def get_many(self, filter_by: dict) -> list[Torrent]:
         return await self._torrent_mng.get_many(filter_by)
     
+    async def get_processing_with_users(self, info_hashes: list[str] | None = None) -> list[tuple[Torrent, User]]:
+        """Return torrents being downloaded paired with each of their users, in one query."""
+        return await self._torrent_mng.get_processing_with_users(info_hashes)
+    
     async def update_torrent(self, data: dict, torrent_id: int) -> Torrent | None:
         return await self._torrent_mng.update(data, torrent_id)
 
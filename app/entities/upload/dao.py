@@ -0,0 +1,106 @@
+from datetime import datetime
+from typing import Sequence
+
+import sqlalchemy as sa
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.dao import BaseDAO
+from app.models import UploadDispatch
+
+QUEUED = 'queued'
+UPLOADING = 'uploading'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class UploadDispatchDAO(BaseDAO):
+    model = UploadDispatch
+
+    @classmethod
+    async def claim(
+        cls,
+        user_id: int,
+        torrent_id: int,
+        contents_key: str,
+        contents_ids: list[int],
+        payload_size: int,
+        leased_before: datetime,
+        max_attempts: int,
+        now: datetime,
+    ) -> UploadDispatch | None:
+        """Insert a queued dispatch, or requeue the existing one if it failed or its lease expired.
+
+        Return None if the same contents are already queued, being uploaded or uploaded.
+        """
+        cls._check_model()
+        query = insert(cls.model).values(
+            user_id=user_id,
+            torrent_id=torrent_id,
+            contents_key=contents_key,
+            contents_ids=contents_ids,
+            payload_size=payload_size,
+            status=QUEUED,
+            attempts=1,
+            created_at=now,
+            updated_at=now,
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[cls.model.user_id, cls.model.contents_key],
+            set_={
+                'torrent_id': query.excluded.torrent_id,
+                'status': QUEUED,
+                'attempts': cls.model.attempts + 1,
+                'updated_at': now,
+            },
+            where=and_(
+                cls.model.attempts < max_attempts,
+                or_(
+                    cls.model.status == FAILED,
+                    and_(cls.model.status.in_((QUEUED, UPLOADING)), cls.model.updated_at < leased_before),
+                ),
+            ),
+        ).returning(cls.model)
+        result = await cls._execute_query(query)
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def fetch_pending(cls, torrent_ids: Sequence[int], leased_since: datetime) -> Sequence[UploadDispatch]:
+        cls._check_model()
+        if not torrent_ids:
+            return []
+        query = select(cls.model).where(
+            cls.model.torrent_id.in_(torrent_ids),
+            cls.model.status.in_((QUEUED, UPLOADING)),
+            cls.model.updated_at >= leased_since,
+        )
+        result = await cls._execute_query(query)
+        return result.scalars().all()
+
+    @classmethod
+    async def fetch_queued(cls, limit: int, aging_rate: int, now: datetime) -> Sequence[UploadDispatch]:
+        """Fetch the queued dispatches, smallest first, a dispatch gaining `aging_rate` bytes per second queued."""
+        cls._check_model()
+        waited = func.extract('epoch', sa.literal(now, sa.DateTime) - cls.model.updated_at)
+        query = (
+            select(cls.model)
+            .where(cls.model.status == QUEUED)
+            .order_by(cls.model.payload_size - aging_rate * waited, cls.model.id)
+            .limit(limit)
+        )
+        result = await cls._execute_query(query)
+        return result.scalars().all()
+
+    @classmethod
+    async def transit(
+        cls, dispatch_id: int, from_statuses: Sequence[str], status: str, now: datetime
+    ) -> UploadDispatch | None:
+        cls._check_model()
+        query = (
+            update(cls.model)
+            .where(cls.model.id == dispatch_id, cls.model.status.in_(from_statuses))
+            .values(status=status, updated_at=now)
+            .returning(cls.model)
+        )
+        result = await cls._execute_query(query)
+        return result.scalar_one_or_none()
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+from typing import Sequence
+
+from app.entities.upload.dao import UploadDispatchDAO
+from app.models import UploadDispatch
+
+
+class UploadDispatchManager:
+    def __init__(self, dao: UploadDispatchDAO = UploadDispatchDAO):
+        self._dao = dao
+
+    async def claim(
+        self,
+        user_id: int,
+        torrent_id: int,
+        contents_key: str,
+        contents_ids: list[int],
+        payload_size: int,
+        lease: int,
+        max_attempts: int,
+    ) -> UploadDispatch | None:
+        now = datetime.now().replace(microsecond=0)
+        return await self._dao.claim(
+            user_id, torrent_id, contents_key, contents_ids, payload_size, now - timedelta(seconds=lease), max_attempts, now
+        )
+
+    async def get_pending(self, torrent_ids: Sequence[int], lease: int) -> Sequence[UploadDispatch]:
+        return await self._dao.fetch_pending(torrent_ids, datetime.now() - timedelta(seconds=lease))
+
+    async def get_queued(self, limit: int, aging_rate: int) -> Sequence[UploadDispatch]:
+        return await self._dao.fetch_queued(limit, aging_rate, datetime.now())
+
+    async def transit(self, dispatch_id: int, from_statuses: Sequence[str], status: str) -> UploadDispatch | None:
+        return await self._dao.transit(dispatch_id, from_statuses, status, datetime.now().replace(microsecond=0))
+
+
+upload_dispatch_manager = UploadDispatchManager()
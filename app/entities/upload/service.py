@@ -0,0 +1,64 @@
+import hashlib
+from collections import defaultdict
+from typing import Sequence
+
+from loguru import logger
+
+from app.config import config
+from app.entities.upload.dao import DONE, FAILED, QUEUED, UPLOADING
+from app.entities.upload.manager import UploadDispatchManager, upload_dispatch_manager
+from app.models import UploadDispatch
+
+
+class UploadDispatchService:
+    """Ledger of the uploads sent to the workers.
+
+    A set of contents is dispatched to a user once: `claim()` records it as queued in one
+    atomic statement and returns nothing if it's already queued, being uploaded or done.
+    A failed upload, or one that hasn't finished within `UPLOAD_DISPATCH_LEASE` (the worker
+    crashed), is claimed again, up to `UPLOAD_DISPATCH_MAX_ATTEMPTS` times.
+    """
+
+    def __init__(self, upload_dispatch_manager: UploadDispatchManager = upload_dispatch_manager):
+        self._dispatch_mng = upload_dispatch_manager
+        self._lease = config.UPLOAD_DISPATCH_LEASE
+        self._max_attempts = config.UPLOAD_DISPATCH_MAX_ATTEMPTS
+
+    async def claim(
+        self, user_id: int, torrent_id: int, contents_ids: list[int], payload_size: int = 0
+    ) -> UploadDispatch | None:
+        contents_ids = sorted(set(contents_ids))
+        contents_key = hashlib.sha1(','.join(map(str, contents_ids)).encode()).hexdigest()
+        return await self._dispatch_mng.claim(
+            user_id, torrent_id, contents_key, contents_ids, payload_size, self._lease, self._max_attempts
+        )
+
+    async def get_pending_contents_ids(self, torrent_ids: Sequence[int]) -> dict[tuple[int, int], set[int]]:
+        """Map (user_id, torrent_id) to the ids of contents queued or being uploaded under a live lease."""
+        pending = defaultdict(set)
+        for dispatch in await self._dispatch_mng.get_pending(torrent_ids, self._lease):
+            pending[(dispatch.user_id, dispatch.torrent_id)].update(dispatch.contents_ids)
+        return pending
+
+    async def get_queued(self, limit: int = 1000) -> list[UploadDispatch]:
+        """Fetch the queued dispatches, smallest payload first, aged by `UPLOAD_AGING_RATE`."""
+        return list(await self._dispatch_mng.get_queued(limit, config.UPLOAD_AGING_RATE))
+
+    async def start(self, dispatch_id: int) -> UploadDispatch | None:
+        """Mark the dispatch as being uploaded. Return None if it isn't queued (a duplicate message)."""
+        return await self._dispatch_mng.transit(dispatch_id, (QUEUED,), UPLOADING)
+
+    async def requeue(self, dispatch_id: int) -> None:
+        """Put the dispatch being uploaded back in the queue, without counting an attempt."""
+        await self._dispatch_mng.transit(dispatch_id, (UPLOADING,), QUEUED)
+
+    async def finish(self, dispatch_id: int, succeeded: bool) -> None:
+        status = DONE if succeeded else FAILED
+        dispatch = await self._dispatch_mng.transit(dispatch_id, (QUEUED, UPLOADING), status)
+        if dispatch is None:
+            logger.warning(f"[!] UPLOAD DISPATCH: Dispatch {dispatch_id} was finished already")
+        else:
+            logger.debug(f"[*] UPLOAD DISPATCH: Dispatch {dispatch_id} {status}, attempt {dispatch.attempts}")
+
+
+upload_dispatch_service = UploadDispatchService()
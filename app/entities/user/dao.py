@@ -1,7 +1,7 @@
 from sqlalchemy import delete, and_, select
 
 from app.dao import BaseDAO
-from app.models import Torrent, User, user_torrent_association, user_content_association
+from app.models import Content, Torrent, User, user_torrent_association, user_content_association
 
 
 class UserDAO(BaseDAO):
@@ -38,3 +38,15 @@ class UserContentDAO(BaseDAO):
         )
         result = await cls._execute_query(query)
         return result.rowcount
+
+    @classmethod
+    async def fetch_selected_contents(cls, torrent_ids: list[int]) -> list[tuple[int, Content]]:
+        if not torrent_ids:
+            return []
+        query = (
+            select(cls.model.c.user_id, Content)
+            .join(Content, Content.id == cls.model.c.content_id)
+            .where(Content.torrent_id.in_(torrent_ids))
+        )
+        result = await cls._execute_query(query)
+        return result.all()
@@ -3,7 +3,7 @@ from telegram import User as TGUser
 
 from app.entities.user.dao import UserDAO, UserTorrentDAO, UserContentDAO
 from app.entities.user.schema import UserSaveSchema
-from app.models import Torrent, User
+from app.models import Content, Torrent, User
 
 
 class UserManager:
@@ -85,6 +85,9 @@ class UserContentManager:
     async def delete_many(self, user_id: int, content_ids: list[int]) -> int:
         rows_affected = await self._dao.delete_many_specific(user_id, content_ids)
         return rows_affected
+    
+    async def get_selected_contents(self, torrent_ids: list[int]) -> list[tuple[int, Content]]:
+        return await self._dao.fetch_selected_contents(torrent_ids)
 
 
 user_manager = UserManager()
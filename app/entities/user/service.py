@@ -7,7 +7,7 @@ from app.entities.user.manager import (
     UserManager, UserTorrentManager, user_manager, user_torrent_manager,
     UserContentManager, user_content_manager,
 )
-from app.models import Torrent, User, user_content_association, user_torrent_association
+from app.models import Content, Torrent, User, user_content_association, user_torrent_association
 
 
 class UserService:
@@ -96,6 +96,10 @@ class UserContentService:
     async def delete_associations(self, user_id: int, content_ids: list[int]) -> int:
         rows_affected = await self._user_content_mng.delete_many(user_id, content_ids)
         return rows_affected
+    
+    async def find_selected_contents(self, torrent_ids: list[int]) -> list[tuple[int, Content]]:
+        """Return (user_id, content) pairs of the contents users selected in the given torrents."""
+        return await self._user_content_mng.get_selected_contents(torrent_ids)
 
 
 user_service = UserService()
@@ -61,6 +61,7 @@ class Torrent(Base):
     task_sent_at: orm.Mapped[Optional[datetime]] = orm.mapped_column(default=None)
     is_processing: orm.Mapped[flag_default_false]
     is_bad: orm.Mapped[flag_default_false]
+    qbit_node: orm.Mapped[Optional[str]] = orm.mapped_column(sa.String(255), default=None)
     users: orm.Mapped[list[User]] = orm.relationship(
         'User',
         secondary=user_torrent_association,
@@ -93,4 +94,62 @@ class Content(Base):
     __tablename__ = 'content'
 
 
-Models: list[type[Base]] = [User, Torrent, Content]
+class TorrentMetadata(Base):
+    id: orm.Mapped[intpk]
+    info_hash: orm.Mapped[str] = orm.mapped_column(sa.String(65), unique=True)
+    name: orm.Mapped[str] = orm.mapped_column(sa.Text())
+    total_size: orm.Mapped[int] = orm.mapped_column(sa.BigInteger)
+    files: orm.Mapped[list[dict]] = orm.mapped_column(sa.JSON())
+    raw_info: orm.Mapped[Optional[bytes]] = orm.mapped_column(sa.LargeBinary(), default=None)
+    created_at: orm.Mapped[datetime_default_now]
+    last_used_at: orm.Mapped[datetime_default_now] = orm.mapped_column(index=True)
+
+    __tablename__ = 'torrent_metadata'
+
+
+class UploadDispatch(Base):
+    id: orm.Mapped[intpk]
+    user_id: orm.Mapped[int] = orm.mapped_column(
+        sa.Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False
+    )
+    torrent_id: orm.Mapped[int] = orm.mapped_column(
+        sa.Integer, ForeignKey('torrent.id', ondelete='CASCADE'), nullable=False
+    )
+    contents_key: orm.Mapped[str] = orm.mapped_column(sa.String(40))
+    contents_ids: orm.Mapped[list[int]] = orm.mapped_column(sa.JSON())
+    payload_size: orm.Mapped[int] = orm.mapped_column(sa.BigInteger, default=0, server_default='0')
+    status: orm.Mapped[str] = orm.mapped_column(sa.String(16), index=True)
+    attempts: orm.Mapped[int] = orm.mapped_column(sa.Integer, default=0, server_default='0')
+    created_at: orm.Mapped[datetime_default_now]
+    updated_at: orm.Mapped[datetime_default_now]
+
+    __tablename__ = 'upload_dispatch'
+    __table_args__ = (
+        sa.UniqueConstraint('user_id', 'contents_key'),
+    )
+
+
+class TelegramFile(Base):
+    id: orm.Mapped[intpk]
+    cache_key: orm.Mapped[str] = orm.mapped_column(sa.String(255), unique=True)
+    file_id: orm.Mapped[str] = orm.mapped_column(sa.Text())
+    account_id: orm.Mapped[int] = orm.mapped_column(sa.BigInteger)
+    created_at: orm.Mapped[datetime_default_now]
+
+    __tablename__ = 'telegram_file'
+
+
+class KnownPeer(Base):
+    id: orm.Mapped[intpk]
+    account_id: orm.Mapped[int] = orm.mapped_column(sa.BigInteger)
+    tg_id: orm.Mapped[int] = orm.mapped_column(sa.BigInteger)
+    dialog_date: orm.Mapped[Optional[datetime]] = orm.mapped_column(default=None)
+    last_seen_at: orm.Mapped[datetime_default_now]
+
+    __tablename__ = 'known_peer'
+    __table_args__ = (
+        sa.UniqueConstraint('account_id', 'tg_id'),
+    )
+
+
+Models: list[type[Base]] = [User, Torrent, Content, TorrentMetadata, UploadDispatch, TelegramFile, KnownPeer]
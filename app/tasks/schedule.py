@@ -1,10 +1,14 @@
 from datetime import timedelta
 
+from app.config import config
+
 
 class ScheduledTasks:
     watchdog_tasks = {
         "watchdog": {
             "task": "app.tasks.tasks.watch_for_downloads_task",
-            "schedule": timedelta(seconds=60),
+            "schedule": timedelta(seconds=config.WATCHDOG_TICK_INTERVAL),
+            # Ticks stuck in the queue behind a slow one are dropped rather than run in a burst.
+            "options": {"expires": config.WATCHDOG_TICK_INTERVAL},
         },
     }
@@ -8,3 +8,9 @@ from app.watchdog.watchdog import watch_for_downloads
 def watch_for_downloads_task() -> None:
     loop = asyncio.get_event_loop()
     loop.run_until_complete(watch_for_downloads())
+
+
+@celery_app.task
+def watch_torrents_task(info_hashes: list[str]) -> None:
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(watch_for_downloads(info_hashes))
@@ -1,10 +1,27 @@
 import asyncio
 
+from celery.signals import worker_process_shutdown
+
 from app.celery_queue import celery_app
+from app.uploader.scheduler import upload_scheduler
+from app.uploader.telegram import telegram_client_manager
 from app.uploader.uploader import uploader
 
 
 @celery_app.task
-def upload_downloaded_contents(user_id: int, contents: list[int], torrent_id: int) -> None:
+def upload_downloaded_contents(
+    user_id: int, contents: list[int], torrent_id: int, dispatch_id: int | None = None
+) -> None:
+    loop = asyncio.get_event_loop()
+    if dispatch_id is None:
+        loop.run_until_complete(uploader(user_id, contents, torrent_id))
+    else:
+        # The ledger is the queue: the scheduler runs this dispatch along with all the queued ones,
+        # and the messages of the dispatches it has already run find them taken.
+        loop.run_until_complete(upload_scheduler.drain())
+
+
+@worker_process_shutdown.connect
+def stop_telegram_client(**kwargs) -> None:
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(uploader(user_id, contents,torrent_id))
+    loop.run_until_complete(telegram_client_manager.stop())
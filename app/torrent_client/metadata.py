@@ -0,0 +1,72 @@
+import asyncio
+
+from httpx import HTTPStatusError
+from loguru import logger
+
+from app.torrent_client.pool import TorrentClientPool, torrent_client_pool
+
+
+class MetadataWaiter:
+    """Wait for torrents metadata to arrive in qBittorrent.
+
+    Only one poller runs per info hash; every coroutine waiting for the same hash shares its
+    future and is resolved at once. The poller backs off exponentially, so metadata arriving
+    quickly is noticed quickly, while a dead torrent doesn't flood qBittorrent with requests.
+    """
+
+    def __init__(
+        self,
+        torrent_client: TorrentClientPool = torrent_client_pool,
+        timeout: float = 60,
+        initial_delay: float = 0.25,
+        max_delay: float = 4,
+    ):
+        self._torrent_cli = torrent_client
+        self._timeout = timeout
+        self._initial_delay = initial_delay
+        self._max_delay = max_delay
+        self._pending: dict[str, asyncio.Future] = dict()
+        self._pollers: set[asyncio.Task] = set()
+
+    async def wait(self, info_hash: str) -> list[dict]:
+        """Return the file list of the torrent or an empty list if metadata didn't arrive in time."""
+        info_hash = info_hash.lower()
+        future = self._pending.get(info_hash)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[info_hash] = future
+            poller = asyncio.create_task(self._poll(info_hash, future))
+            self._pollers.add(poller)
+            poller.add_done_callback(self._pollers.discard)
+        return await asyncio.shield(future)
+
+    async def _poll(self, info_hash: str, future: asyncio.Future) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._timeout
+        delay = self._initial_delay
+        torrent_files = []
+        try:
+            while True:
+                try:
+                    torrent_files = await self._get_torrent_files(info_hash)
+                except HTTPStatusError:
+                    torrent_files = []
+                if torrent_files:
+                    break
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(delay, remaining))
+                delay = min(delay * 2, self._max_delay)
+        except Exception as e:
+            logger.error(f"[!] METADATA WAITER: Polling of torrent {info_hash} failed: {e}")
+        finally:
+            self._pending.pop(info_hash, None)
+            if not future.done():
+                future.set_result(torrent_files)
+
+    async def _get_torrent_files(self, info_hash: str) -> list[dict]:
+        return await self._torrent_cli.get_torrent_files(info_hash)
+
+
+metadata_waiter = MetadataWaiter()
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+from typing import Iterable
+
+import httpx
+from loguru import logger
+
+from app.config import config
+from app.torrent_client.qbittorrent import TorrentClient
+
+
+class TorrentClientPool:
+    """A set of qBittorrent instances sharing the download load.
+
+    Every torrent lives on one node. The node is chosen by `assign()`, either by rendezvous
+    hashing of the info hash (stable, needs no state) or by the least number of torrents on
+    the node, and is recorded on the `Torrent` row. Processes that didn't assign the torrent
+    themselves learn its node with `bind()`, and forget it with `unbind()` once the torrent is
+    gone, as `delete_permanently()` does. The pool exposes the `TorrentClient` methods and
+    routes every call to the node of the torrent.
+    """
+
+    def __init__(
+        self, dsns: Iterable[str], username: str, password: str, placement: str = 'hash', session_ttl: float = 3000.0
+    ):
+        self._clients = {dsn: TorrentClient(dsn, username, password, session_ttl=session_ttl) for dsn in dsns}
+        if not self._clients:
+            raise ValueError("At least one qBittorrent instance is required")
+        self._placement = placement
+        self._placements: dict[str, str] = dict()
+
+    @property
+    def nodes(self) -> list[str]:
+        return list(self._clients)
+
+    def client(self, node: str) -> TorrentClient:
+        return self._clients[node]
+
+    def node_of(self, info_hash: str) -> str:
+        info_hash = info_hash.lower()
+        return self._placements.get(info_hash) or self._hash_node(info_hash)
+
+    def bind(self, info_hash: str, node: str | None) -> None:
+        if node in self._clients:
+            self._placements[info_hash.lower()] = node
+
+    def unbind(self, info_hash: str) -> None:
+        self._placements.pop(info_hash.lower(), None)
+
+    async def assign(self, info_hash: str) -> str:
+        """Choose the node for the torrent, keeping the one it's already bound to."""
+        info_hash = info_hash.lower()
+        node = self._placements.get(info_hash)
+        if node:
+            return node
+        if self._placement == 'load' and len(self._clients) > 1:
+            node = await self._least_loaded_node()
+        else:
+            node = self._hash_node(info_hash)
+        self._placements[info_hash] = node
+        return node
+
+    def _hash_node(self, info_hash: str) -> str:
+        return max(self._clients, key=lambda node: hashlib.sha1(f'{node}|{info_hash}'.encode()).digest())
+
+    async def _least_loaded_node(self) -> str:
+        async def count(node: str) -> float:
+            try:
+                return await self._clients[node].count_torrents()
+            except httpx.HTTPError as e:
+                logger.error(f"[!] TORRENT CLIENT POOL: Failed to get load of node {node}: {e}")
+                return float('inf')
+        loads = await asyncio.gather(*(count(node) for node in self._clients))
+        return min(zip(loads, self._clients))[1]
+
+    async def close(self) -> None:
+        await asyncio.gather(*(client.close() for client in self._clients.values()))
+
+    async def download_from_link(self, link: str, info_hash: str, savepath: str | None = None, **kwargs) -> None:
+        node = await self.assign(info_hash)
+        await self._clients[node].download_from_link(link, savepath=savepath, **kwargs)
+
+    async def download_from_file(self, file: bytes, info_hash: str, savepath: str | None = None, **kwargs) -> None:
+        node = await self.assign(info_hash)
+        await self._clients[node].download_from_file(file, savepath=savepath, **kwargs)
+
+    async def get_torrent_files(self, info_hash: str) -> list[dict]:
+        return await self._clients[self.node_of(info_hash)].get_torrent_files(info_hash)
+
+    async def get_torrent(self, info_hash: str) -> dict:
+        return await self._clients[self.node_of(info_hash)].get_torrent(info_hash)
+
+    async def set_file_priority(self, info_hash: str, file_id: int, priority: int) -> None:
+        await self._clients[self.node_of(info_hash)].set_file_priority(info_hash, file_id, priority)
+
+    async def set_files_priority(self, info_hash: str, file_ids: Iterable[int], priority: int) -> None:
+        await self._clients[self.node_of(info_hash)].set_files_priority(info_hash, file_ids, priority)
+
+    async def delete_permanently(self, info_hash: str) -> None:
+        await self._clients[self.node_of(info_hash)].delete_permanently(info_hash)
+        self.unbind(info_hash)
+
+
+torrent_client_pool = TorrentClientPool(
+    config.qbittorrent_client_dsns,
+    config.QBITTORRENT_AUTH_USER,
+    config.qbittorrent_auth_pass,
+    config.QBITTORRENT_PLACEMENT,
+    config.QBITTORRENT_SESSION_TTL,
+)
@@ -1,35 +1,132 @@
-from typing import Any, Callable
+import asyncio
+import time
+from typing import Iterable
 
-from qbittorrent import Client
-from requests import HTTPError
+import httpx
 
-from app.config import config
+
+class TorrentClientAuthError(Exception):
+    pass
 
 
 class TorrentClient:
-    def __init__(self, dsn: str, username: str, password: str):
-        self._client = Client(dsn)
-        self._client.login(username, password)
+    """Async qBittorrent WebUI API client.
+
+    All requests go through one pooled keep-alive `httpx.AsyncClient`, so a slow
+    qBittorrent response only suspends the coroutine waiting for it.
+
+    Authentication is handled here as well. The session is refreshed before qBittorrent's
+    inactivity timeout runs out, and a request rejected with 403 is retried once after
+    logging in again. Concurrent callers share a single login: whoever comes second finds
+    the generation counter moved and doesn't log in again.
+    """
+
+    def __init__(
+        self, dsn: str, username: str, password: str, timeout: float = 30.0, session_ttl: float = 3000.0
+    ):
+        self._dsn = dsn.rstrip('/')
+        self._username = username
+        self._password = password
+        self._timeout = timeout
+        self._session_ttl = session_ttl
+        self._session: httpx.AsyncClient | None = None
+        self._auth_lock = asyncio.Lock()
+        self._auth_generation = 0
+        self._last_used_at: float | None = None
+
+    @property
+    def session(self) -> httpx.AsyncClient:
+        # The session is created lazily so it binds to the event loop that actually uses it.
+        if self._session is None or self._session.is_closed:
+            self._session = httpx.AsyncClient(
+                base_url=f'{self._dsn}/api/v2/',
+                headers={'Referer': self._dsn},
+                timeout=self._timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.is_closed:
+            await self._session.aclose()
+        self._session = None
+        self._last_used_at = None
+
+    async def _request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
+        if self._last_used_at is None or time.monotonic() - self._last_used_at > self._session_ttl:
+            await self._relogin(self._auth_generation)
+        generation = self._auth_generation
+        response = await self.session.request(method, endpoint, **kwargs)
+        if response.status_code == httpx.codes.FORBIDDEN:
+            await self._relogin(generation)
+            response = await self.session.request(method, endpoint, **kwargs)
+        response.raise_for_status()
+        self._last_used_at = time.monotonic()
+        return response
+
+    async def login(self) -> None:
+        await self._relogin(self._auth_generation)
+
+    async def _relogin(self, seen_generation: int) -> None:
+        async with self._auth_lock:
+            if self._auth_generation != seen_generation:
+                return  # Somebody has logged in while we were waiting for the lock.
+            response = await self.session.post(
+                'auth/login', data={'username': self._username, 'password': self._password}
+            )
+            response.raise_for_status()
+            if response.text != 'Ok.':
+                raise TorrentClientAuthError(f"Failed to log in to qBittorrent at {self._dsn}")
+            self._auth_generation += 1
+            self._last_used_at = time.monotonic()
+
+    async def download_from_link(self, link: str, savepath: str | None = None, **kwargs) -> None:
+        data = {'urls': link, **kwargs}
+        if savepath:
+            data['savepath'] = savepath
+        await self._request('POST', 'torrents/add', data=data)
+
+    async def download_from_file(self, file: bytes, savepath: str | None = None, **kwargs) -> None:
+        data = {**kwargs}
+        if savepath:
+            data['savepath'] = savepath
+        await self._request(
+            'POST', 'torrents/add', data=data,
+            files={'torrents': ('upload.torrent', file, 'application/x-bittorrent')},
+        )
+
+    async def get_torrent_files(self, info_hash: str) -> list[dict]:
+        response = await self._request('GET', 'torrents/files', params={'hash': info_hash.lower()})
+        return response.json()
+
+    async def get_torrent(self, info_hash: str) -> dict:
+        response = await self._request('GET', 'torrents/properties', params={'hash': info_hash.lower()})
+        return response.json()
 
-    def __getattr__(self, name):
-        return getattr(self._client, name)
+    async def set_file_priority(self, info_hash: str, file_id: int, priority: int) -> None:
+        await self._request(
+            'POST', 'torrents/filePrio',
+            data={'hash': info_hash.lower(), 'id': file_id, 'priority': priority},
+        )
 
-    def login(self, username=config.QBITTORRENT_AUTH_USER, password=config.qbittorrent_auth_pass):
-        return self._client.login(username, password)
+    async def set_files_priority(self, info_hash: str, file_ids: Iterable[int], priority: int) -> None:
+        """Set the priority of many files at once (qBittorrent accepts pipe-separated ids)."""
+        await self._request(
+            'POST', 'torrents/filePrio',
+            data={'hash': info_hash.lower(), 'id': '|'.join(str(file_id) for file_id in file_ids), 'priority': priority},
+        )
 
+    async def count_torrents(self) -> int:
+        response = await self._request('GET', 'torrents/info')
+        return len(response.json())
 
-def with_relogin(func: Callable) -> Callable:
-    def wrapper(self, *args, **kwargs) -> Any:
-        try:
-            return func(self, *args, **kwargs)
-        except HTTPError:
-            self._torrent_cli.login()
-            return func(self, *args, **kwargs)
-    return wrapper
+    async def sync_maindata(self, rid: int = 0) -> dict:
+        """Return the state delta since `rid` (a full snapshot when `rid` is 0 or stale)."""
+        response = await self._request('GET', 'sync/maindata', params={'rid': rid})
+        return response.json()
 
+    async def delete_permanently(self, info_hash: str) -> None:
+        await self._request(
+            'POST', 'torrents/delete', data={'hashes': info_hash.lower(), 'deleteFiles': 'true'}
+        )
 
-torrent_client = TorrentClient(
-    config.QBITTORRENT_CLIENT_DSN,
-    config.QBITTORRENT_AUTH_USER,
-    config.qbittorrent_auth_pass,
-)
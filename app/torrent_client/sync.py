@@ -0,0 +1,68 @@
+import httpx
+from loguru import logger
+
+from app.torrent_client.pool import TorrentClientPool, torrent_client_pool
+
+
+class TorrentsMirror:
+    """In-memory mirror of qBittorrent torrents state.
+
+    The mirror is fed by `/api/v2/sync/maindata` deltas: qBittorrent returns only the fields
+    changed since the `rid` cursor, so one request per instance and tick is enough to learn
+    which torrents made progress.
+    """
+
+    def __init__(self, torrent_client: TorrentClientPool = torrent_client_pool):
+        self._torrent_cli = torrent_client
+        self._rids: dict[str, int] = dict()
+        self._nodes_torrents: dict[str, dict[str, dict]] = dict()
+
+    async def refresh(self) -> set[str] | None:
+        """Apply the next delta of every qBittorrent instance and return the hashes whose progress changed.
+
+        Return None if a delta could not be fetched, so the caller falls back to a full check.
+        """
+        changed = set()
+        for node in self._torrent_cli.nodes:
+            node_changed = await self._refresh_node(node)
+            if node_changed is None:
+                return None
+            changed |= node_changed
+        return changed
+
+    async def _refresh_node(self, node: str) -> set[str] | None:
+        try:
+            data = await self._sync_maindata(node, self._rids.get(node, 0))
+        except httpx.HTTPError as e:
+            logger.error(f"[!] TORRENTS MIRROR: Failed to sync maindata of {node}: {e}")
+            self._rids[node] = 0
+            return None
+        self._rids[node] = data.get('rid', 0)
+        previous = self._nodes_torrents.get(node, dict())
+        torrents = dict() if data.get('full_update') else previous
+        changed = set()
+        for info_hash, delta in data.get('torrents', {}).items():
+            state = torrents.setdefault(info_hash, dict(previous.get(info_hash, {})))
+            old_progress = state.get('progress')
+            state.update(delta)
+            if state.get('progress') != old_progress:
+                changed.add(info_hash)
+        for info_hash in data.get('torrents_removed', []):
+            torrents.pop(info_hash, None)
+        self._nodes_torrents[node] = torrents
+        return changed
+
+    def state(self, info_hash: str) -> dict | None:
+        return self._nodes_torrents.get(self._torrent_cli.node_of(info_hash), {}).get(info_hash)
+
+    def progress(self, info_hash: str) -> float | None:
+        state = self.state(info_hash)
+        if state is None:
+            return None
+        return state.get('progress')
+
+    async def _sync_maindata(self, node: str, rid: int) -> dict:
+        return await self._torrent_cli.client(node).sync_maindata(rid)
+
+
+torrents_mirror = TorrentsMirror()
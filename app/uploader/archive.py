@@ -0,0 +1,308 @@
+import io
+import os
+import struct
+import tempfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterable
+
+from loguru import logger
+
+LOCAL_HEADER = struct.Struct('<4sHHHHHLLLHH')
+DATA_DESCRIPTOR = struct.Struct('<4sLLL')
+CENTRAL_HEADER = struct.Struct('<4sHHHHHHLLLHHHHHLL')
+END_OF_CENTRAL_DIR = struct.Struct('<4sHHHHLLH')
+
+ZIP_VERSION = 20
+MADE_BY_UNIX = 3 << 8
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP32_MAX_MEMBERS = 0xFFFF
+CHUNK_SIZE = 1024 * 1024
+# Text and subtitles shrink well; everything else (video, audio, images, archives) is stored.
+COMPRESSIBLE_EXTENSIONS = frozenset((
+    '.txt', '.nfo', '.log', '.cue', '.md', '.json', '.xml', '.html', '.htm', '.csv', '.m3u', '.m3u8',
+    '.srt', '.ass', '.ssa', '.sub', '.vtt', '.idx', '.smi', '.sbv', '.lrc',
+))
+
+
+def _dos_datetime(timestamp: float) -> tuple[int, int]:
+    year, month, day, hour, minute, second = time.localtime(timestamp)[:6]
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+class _Member:
+    __slots__ = (
+        'path', 'name', 'flags', 'size', 'mode', 'dos_time', 'dos_date', 'offset', 'data_offset',
+        'method', 'deflated', 'stored_size', 'crc', 'crc_pos',
+    )
+
+    def __init__(self, path: str, arcname: str, offset: int, deflated: tuple[int, bytes] | None = None):
+        stat = os.stat(path)
+        self.path = path
+        self.name = arcname.replace(os.sep, '/').encode('utf-8')
+        self.flags = FLAG_DATA_DESCRIPTOR | (0 if arcname.isascii() else FLAG_UTF8)
+        self.size = stat.st_size
+        self.mode = stat.st_mode
+        self.dos_time, self.dos_date = _dos_datetime(stat.st_mtime)
+        self.offset = offset
+        self.data_offset = offset + LOCAL_HEADER.size + len(self.name)
+        if deflated is None:
+            self.method, self.deflated, self.stored_size = zipfile.ZIP_STORED, None, self.size
+            self.crc = 0
+            self.crc_pos = 0  # The CRC covers the data up to here, as it's been read so far.
+        else:
+            self.method, self.stored_size = zipfile.ZIP_DEFLATED, len(deflated[1])
+            self.crc, self.deflated = deflated
+            self.crc_pos = self.size
+
+    @property
+    def end(self) -> int:
+        return self.data_offset + self.stored_size + DATA_DESCRIPTOR.size
+
+    def local_header(self) -> bytes:
+        return LOCAL_HEADER.pack(
+            b'PK\x03\x04', ZIP_VERSION, self.flags, self.method, self.dos_time, self.dos_date,
+            0, self.stored_size, self.size, len(self.name), 0,
+        ) + self.name
+
+    def data_descriptor(self) -> bytes:
+        return DATA_DESCRIPTOR.pack(b'PK\x07\x08', self.crc, self.stored_size, self.size)
+
+    def central_header(self) -> bytes:
+        return CENTRAL_HEADER.pack(
+            b'PK\x01\x02', MADE_BY_UNIX | ZIP_VERSION, ZIP_VERSION, self.flags, self.method,
+            self.dos_time, self.dos_date, self.crc, self.stored_size, self.size, len(self.name), 0, 0, 0, 0,
+            (self.mode & 0xFFFF) << 16, self.offset,
+        ) + self.name
+
+
+class StreamingZip(io.RawIOBase):
+    """A zip archive of files, produced while it is read.
+
+    Nothing is written to disk: the size of the archive is known up front, so it can be
+    handed to Pyrogram as a seekable file and the upload starts right away. Stored members
+    are read straight from their files. The CRCs, needed only by the data descriptors and the
+    central directory, are computed from the member data as it's read, or by reading the rest
+    of the member if it was skipped over. Deflated members are compressed beforehand and
+    passed in `deflated` as (CRC, compressed data) by the member path.
+    """
+
+    def __init__(
+        self, members: Iterable[tuple[str, str]], name: str, deflated: dict[str, tuple[int, bytes]] | None = None
+    ):
+        super().__init__()
+        self.name = name
+        self._members: list[_Member] = []
+        deflated = deflated or dict()
+        offset = 0
+        for path, arcname in members:
+            member = _Member(path, arcname, offset, deflated.get(path))
+            self._members.append(member)
+            offset = member.end
+        self._central_dir_offset = offset
+        self._central_dir_size = sum(CENTRAL_HEADER.size + len(member.name) for member in self._members)
+        self._size = self._central_dir_offset + self._central_dir_size + END_OF_CENTRAL_DIR.size
+        self._pos = 0
+        self._file: BinaryIO | None = None
+        self._file_member: _Member | None = None
+        self._central_dir: bytes | None = None
+        self._first_read_at: float | None = None
+
+    @staticmethod
+    def fits(members: Iterable[tuple[str, str]]) -> bool:
+        """Tell whether the files fit a zip archive without the zip64 extensions, which aren't streamed."""
+        members = list(members)
+        if len(members) > ZIP32_MAX_MEMBERS:
+            return False
+        total = 0
+        for path, arcname in members:
+            size = os.path.getsize(path)
+            if size >= ZIP32_LIMIT:
+                return False
+            total += LOCAL_HEADER.size + 2 * len(arcname.encode('utf-8')) + size + DATA_DESCRIPTOR.size
+            total += CENTRAL_HEADER.size
+        return total + END_OF_CENTRAL_DIR.size < ZIP32_LIMIT
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._pos = offset
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        if self._first_read_at is None:
+            self._first_read_at = time.perf_counter()
+        view = memoryview(buffer).cast('B')
+        written = 0
+        while written < len(view) and self._pos < self._size:
+            chunk = self._read_at(self._pos, len(view) - written)
+            view[written:written + len(chunk)] = chunk
+            written += len(chunk)
+            self._pos += len(chunk)
+        return written
+
+    def close(self) -> None:
+        if not self.closed and self._first_read_at is not None:
+            elapsed = time.perf_counter() - self._first_read_at
+            logger.info(
+                f"[*] ARCHIVE: Streamed {self.name}, {self._size / 2 ** 20:.1f} MB in {elapsed:.2f} s "
+                f"({self._size / 2 ** 20 / max(elapsed, 1e-6):.1f} MB/s, upload included)"
+            )
+        self._close_file()
+        super().close()
+
+    def _read_at(self, pos: int, limit: int) -> bytes:
+        if pos >= self._central_dir_offset:
+            if self._central_dir is None:
+                self._central_dir = self._build_central_dir()
+            start = pos - self._central_dir_offset
+            return self._central_dir[start:start + limit]
+        member = self._member_at(pos)
+        if pos < member.data_offset:
+            start = pos - member.offset
+            return member.local_header()[start:start + limit]
+        if pos < member.data_offset + member.stored_size:
+            if member.deflated is not None:
+                start = pos - member.data_offset
+                return member.deflated[start:start + limit]
+            return self._read_data(member, pos - member.data_offset, limit)
+        self._complete_crc(member)
+        start = pos - member.data_offset - member.stored_size
+        return member.data_descriptor()[start:start + limit]
+
+    def _member_at(self, pos: int) -> _Member:
+        low, high = 0, len(self._members) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._members[middle].offset <= pos:
+                low = middle
+            else:
+                high = middle - 1
+        return self._members[low]
+
+    def _read_data(self, member: _Member, start: int, limit: int) -> bytes:
+        file = self._open(member)
+        file.seek(start)
+        data = file.read(min(limit, member.size - start))
+        if len(data) < min(limit, member.size - start):
+            raise OSError(f"File {member.path} was truncated while being archived")
+        if start == member.crc_pos:
+            member.crc = zlib.crc32(data, member.crc)
+            member.crc_pos += len(data)
+        return data
+
+    def _complete_crc(self, member: _Member) -> None:
+        if member.crc_pos == member.size:
+            return
+        file = self._open(member)
+        file.seek(member.crc_pos)
+        while member.crc_pos < member.size:
+            data = file.read(min(CHUNK_SIZE, member.size - member.crc_pos))
+            if not data:
+                raise OSError(f"File {member.path} was truncated while being archived")
+            member.crc = zlib.crc32(data, member.crc)
+            member.crc_pos += len(data)
+
+    def _build_central_dir(self) -> bytes:
+        headers = []
+        for member in self._members:
+            self._complete_crc(member)
+            headers.append(member.central_header())
+        count = len(self._members)
+        headers.append(END_OF_CENTRAL_DIR.pack(
+            b'PK\x05\x06', 0, 0, count, count, self._central_dir_size, self._central_dir_offset, 0
+        ))
+        self._close_file()
+        return b''.join(headers)
+
+    def _open(self, member: _Member) -> BinaryIO:
+        if self._file_member is not member:
+            self._close_file()
+            self._file = open(member.path, 'rb')
+            self._file_member = member
+        return self._file
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file, self._file_member = None, None
+
+
+def compress_type(path: str) -> int:
+    return zipfile.ZIP_DEFLATED if os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS else zipfile.ZIP_STORED
+
+
+def _deflate(path: str) -> tuple[int, bytes]:
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+    crc, chunks = 0, []
+    with open(path, 'rb') as file:
+        while data := file.read(CHUNK_SIZE):
+            crc = zlib.crc32(data, crc)
+            chunks.append(compressor.compress(data))
+    chunks.append(compressor.flush())
+    return crc, b''.join(chunks)
+
+
+def open_archive(
+    members: list[tuple[str, str]], name: str, scratch_dir: str, workers: int = 4, deflate_max_size: int = 64 * 2 ** 20
+) -> BinaryIO:
+    """Open a zip archive of the files (paths with their names in the archive) for upload.
+
+    Compressible members up to `deflate_max_size` are deflated in memory by a pool of
+    `workers` threads (zlib releases the GIL), the rest are stored. Then the archive is
+    streamed, unless it needs zip64: that one is spooled to an anonymous file in
+    `scratch_dir`, removed as soon as it's closed.
+    """
+    started_at = time.perf_counter()
+    to_deflate = [
+        path for path, _ in members
+        if compress_type(path) == zipfile.ZIP_DEFLATED and os.path.getsize(path) <= deflate_max_size
+    ]
+    if StreamingZip.fits(members):
+        deflated = dict()
+        if to_deflate:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for path, (crc, data) in zip(to_deflate, executor.map(_deflate, to_deflate)):
+                    if len(data) < os.path.getsize(path):
+                        deflated[path] = (crc, data)
+        archive = StreamingZip(members, name, deflated)
+        mode = f'streamed, {len(deflated)} of {len(members)} members deflated by {workers} threads'
+    else:
+        logger.info(f"[*] ARCHIVE: {name} needs zip64, spooling it to {scratch_dir}")
+        os.makedirs(scratch_dir, exist_ok=True)
+        archive = tempfile.TemporaryFile(dir=scratch_dir)
+        with zipfile.ZipFile(archive, 'w', allowZip64=True) as zip_file:
+            for path, arcname in members:
+                zip_file.write(path, arcname=arcname, compress_type=compress_type(path))
+        mode = 'spooled'
+    elapsed = time.perf_counter() - started_at
+    size = sum(os.path.getsize(path) for path, _ in members)
+    logger.info(
+        f"[*] ARCHIVE: Built {name} ({mode}): {size / 2 ** 20:.1f} MB of files in {elapsed:.2f} s "
+        f"({size / 2 ** 20 / max(elapsed, 1e-6):.1f} MB/s)"
+    )
+    archive.seek(0)
+    return archive
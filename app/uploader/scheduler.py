@@ -0,0 +1,153 @@
+import asyncio
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+
+from loguru import logger
+from pyrogram.errors import FloodWait
+
+from app.config import config
+from app.entities.upload.service import UploadDispatchService, upload_dispatch_service
+from app.models import UploadDispatch
+from app.uploader.uploader import Uploader, uploader
+
+
+@dataclass
+class UploadJob:
+    dispatch_id: int
+    user_id: int
+    torrent_id: int
+    contents_ids: list[int]
+    payload_size: int
+    queued_at: datetime
+
+    @classmethod
+    def from_dispatch(cls, dispatch: UploadDispatch) -> 'UploadJob':
+        return cls(
+            dispatch.id,
+            dispatch.user_id,
+            dispatch.torrent_id,
+            list(dispatch.contents_ids),
+            dispatch.payload_size,
+            dispatch.updated_at,
+        )
+
+
+class UploadScheduler:
+    """Runs the queued uploads of the dispatch ledger, several at once.
+
+    Jobs are queued per user and taken in rounds, one job per user and round, so a user's
+    40-file batch doesn't hold the others back. Within a round the smallest job goes first,
+    its size discounted by `UPLOAD_AGING_RATE` bytes per second it has waited, so a 20 MB
+    subtitle pack isn't stuck behind a 2 GB archive, and the archive still gets its turn.
+    `UPLOAD_CONCURRENCY` uploads share the worker's Telegram client. A `FloodWait` from
+    Telegram pauses all of them for the time asked; the job that got it is queued again and
+    keeps its user's turn.
+    """
+
+    def __init__(
+        self,
+        uploader: Uploader = uploader,
+        upload_dispatch_service: UploadDispatchService = upload_dispatch_service,
+        concurrency: int = config.UPLOAD_CONCURRENCY,
+        aging_rate: int = config.UPLOAD_AGING_RATE,
+    ):
+        self._uploader = uploader
+        self._dispatch_svc = upload_dispatch_service
+        self._concurrency = concurrency
+        self._aging_rate = aging_rate
+        self._queues: dict[int, list[UploadJob]] = dict()
+        self._round: set[int] = set()  # Users yet to have their turn in this round.
+        self._queued_ids: set[int] = set()
+        self._started_ids: set[int] = set()  # Taken by this drain; not reloaded should they stay queued.
+        self._in_flight = 0
+        self._resume_at = 0.0
+        self._wait_times: deque[float] = deque(maxlen=1000)
+        self._flood_waits = 0
+
+    async def drain(self) -> None:
+        """Run the queued dispatches, and the ones queued meanwhile, until none is left."""
+        # Whatever a failed drain left behind is reloaded from the ledger.
+        self._queues, self._round, self._queued_ids, self._started_ids = dict(), set(), set(), set()
+        while await self._load():
+            await asyncio.gather(*(self._work() for _ in range(self._concurrency)))
+            logger.info(f"[*] UPLOAD SCHEDULER: Queue drained: {self.metrics()}")
+
+    def submit(self, job: UploadJob) -> None:
+        if job.dispatch_id in self._queued_ids:
+            return
+        self._queued_ids.add(job.dispatch_id)
+        self._queues.setdefault(job.user_id, []).append(job)
+
+    def metrics(self) -> dict:
+        wait_times = list(self._wait_times)
+        return {
+            'queue_depth': len(self._queued_ids),
+            'users_queued': len(self._queues),
+            'in_flight': self._in_flight,
+            'paused_for': round(max(0.0, self._resume_at - time.monotonic()), 1),
+            'wait_time_median': round(statistics.median(wait_times), 1) if wait_times else None,
+            'wait_time_max': round(max(wait_times), 1) if wait_times else None,
+            'flood_waits': self._flood_waits,
+        }
+
+    async def _load(self) -> int:
+        for dispatch in await self._dispatch_svc.get_queued():
+            if dispatch.id not in self._started_ids:
+                self.submit(UploadJob.from_dispatch(dispatch))
+        return len(self._queued_ids)
+
+    def _cost(self, job: UploadJob, now: datetime) -> float:
+        return job.payload_size - self._aging_rate * (now - job.queued_at).total_seconds()
+
+    def _next_job(self) -> UploadJob | None:
+        if not self._queues:
+            return None
+        self._round &= self._queues.keys()
+        if not self._round:
+            self._round = set(self._queues)
+        now = datetime.now()
+        job = min(
+            (min(self._queues[user_id], key=lambda job: self._cost(job, now)) for user_id in self._round),
+            key=lambda job: self._cost(job, now),
+        )
+        self._round.discard(job.user_id)
+        queue = self._queues[job.user_id]
+        queue.remove(job)
+        if not queue:
+            del self._queues[job.user_id]
+        self._queued_ids.discard(job.dispatch_id)
+        self._started_ids.add(job.dispatch_id)
+        return job
+
+    def _put_back(self, job: UploadJob) -> None:
+        self.submit(job)
+        self._round.add(job.user_id)
+
+    async def _work(self) -> None:
+        while True:
+            while (pause := self._resume_at - time.monotonic()) > 0:
+                await asyncio.sleep(pause)
+            job = self._next_job()
+            if job is None:
+                return
+            wait_time = (datetime.now() - job.queued_at).total_seconds()
+            self._wait_times.append(wait_time)
+            self._in_flight += 1
+            logger.debug(f"[*] UPLOAD SCHEDULER: Dispatch {job.dispatch_id} started after {wait_time:.1f} s: {self.metrics()}")
+            try:
+                await self._uploader(job.user_id, job.contents_ids, job.torrent_id, job.dispatch_id)
+            except FloodWait as e:
+                self._flood_waits += 1
+                self._resume_at = max(self._resume_at, time.monotonic() + e.value)
+                logger.warning(f"[!] UPLOAD SCHEDULER: FloodWait, uploads paused for {e.value} s")
+                self._put_back(job)
+            except Exception as e:
+                logger.exception(f"[!] UPLOAD SCHEDULER: Dispatch {job.dispatch_id} failed: {e}")
+            finally:
+                self._in_flight -= 1
+
+
+upload_scheduler = UploadScheduler()
@@ -0,0 +1,70 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from loguru import logger
+from pyrogram.client import Client
+
+from app.config import config
+
+UPLOADER_SESSION = "/app/pyrogram_sessions/uploader"
+
+
+class TelegramClientManager:
+    """The uploader's Pyrogram client, connected once per worker process.
+
+    Opening a client for every upload pays for the MTProto connection and the session file
+    load each time, and concurrent opens of the same SQLite session contend. The client is
+    started lazily on first use, shared by all the uploads of the process, started again
+    after a connection failure and stopped when the worker process shuts down.
+    """
+
+    def __init__(self, session: str, api_id: int, api_hash: str):
+        self._session = session
+        self._api_id = api_id
+        self._api_hash = api_hash
+        self._client: Client | None = None
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def client(self) -> AsyncIterator[Client]:
+        """Lend the connected client; a connection failure inside the block drops it for a restart."""
+        client = await self._get()
+        try:
+            yield client
+        except (ConnectionError, OSError) as e:
+            logger.warning(f"[!] TELEGRAM CLIENT: Connection failed, the client will be restarted: {e}")
+            await self._reset(client)
+            raise
+
+    async def stop(self) -> None:
+        async with self._lock:
+            await self._stop()
+
+    async def _get(self) -> Client:
+        async with self._lock:
+            if self._client is None or not self._client.is_connected:
+                await self._stop()
+                client = Client(self._session, api_id=self._api_id, api_hash=self._api_hash, no_updates=True)
+                await client.start()
+                self._client = client
+                logger.info("[*] TELEGRAM CLIENT: Started")
+            return self._client
+
+    async def _reset(self, client: Client) -> None:
+        async with self._lock:
+            if self._client is client:
+                await self._stop()
+
+    async def _stop(self) -> None:
+        client, self._client = self._client, None
+        if client is None:
+            return
+        try:
+            await client.stop()
+            logger.info("[*] TELEGRAM CLIENT: Stopped")
+        except Exception as e:
+            logger.warning(f"[!] TELEGRAM CLIENT: Failed to stop cleanly: {e}")
+
+
+telegram_client_manager = TelegramClientManager(UPLOADER_SESSION, config.TELEGRAM_API_ID, config.TELEGRAM_API_HASH)
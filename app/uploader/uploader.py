@@ -1,15 +1,17 @@
+import asyncio
 import os
 import re
-import zipfile
+from typing import BinaryIO
 
 from loguru import logger
 from pyrogram.client import Client
+from pyrogram.errors import BadRequest, FloodWait
 from pyrogram.errors.exceptions.bad_request_400 import PeerIdInvalid
 
 from app.bot.bot import bot_instance
 from app.config import config
 from app.entities.content.service import ContentService, content_service
-from app.models import Content
+from app.models import Content, Torrent
 from app.entities.user.service import (
     UserContentService,
     UserService,
@@ -19,7 +21,14 @@ from app.entities.user.service import (
     user_torrent_service,
 )
 from app.entities.torrent.service import torrent_service, TorrentService
-from app.torrent_client.qbittorrent import TorrentClient, torrent_client, with_relogin
+from app.entities.peer.service import KnownPeerService, known_peer_service
+from app.entities.telegram_file.service import TelegramFileService, telegram_file_service
+from app.entities.upload.service import UploadDispatchService, upload_dispatch_service
+from app.torrent_client.pool import TorrentClientPool, torrent_client_pool
+from app.uploader.archive import open_archive
+from app.uploader.telegram import TelegramClientManager, telegram_client_manager
+
+PEERS_BATCH_SIZE = 1000
 
 
 class Uploader:
@@ -28,21 +37,46 @@ class Uploader:
         content_service: ContentService = content_service,
         user_service: UserService = user_service,
         user_content_service: UserContentService = user_content_service,
-        torrent_client: TorrentClient = torrent_client,
+        torrent_client: TorrentClientPool = torrent_client_pool,
         torrent_service: TorrentService = torrent_service,
         user_torrent_service: UserTorrentService = user_torrent_service,
+        upload_dispatch_service: UploadDispatchService = upload_dispatch_service,
+        telegram_client_manager: TelegramClientManager = telegram_client_manager,
+        telegram_file_service: TelegramFileService = telegram_file_service,
+        known_peer_service: KnownPeerService = known_peer_service,
     ):
-        self._tg_api_id = config.TELEGRAM_API_ID
-        self._tg_api_hash = config.TELEGRAM_API_HASH
+        self._telegram = telegram_client_manager
+        self._telegram_file_svc = telegram_file_service
+        self._known_peer_svc = known_peer_service
         self._torrent_cli = torrent_client
         self._torrent_svc = torrent_service
         self._content_svc = content_service
         self._user_svc = user_service
         self._user_content_svc = user_content_service
         self._user_torrent_svc = user_torrent_service
+        self._dispatch_svc = upload_dispatch_service
         self._known_user_ids: set[int] = set()
     
-    async def __call__(self, user_id: int, contents_ids: list[int], torrent_id: int) -> None:
+    async def __call__(
+        self, user_id: int, contents_ids: list[int], torrent_id: int, dispatch_id: int | None = None
+    ) -> None:
+        if dispatch_id is not None and not await self._dispatch_svc.start(dispatch_id):
+            logger.info(f"[*] UPLOADER: Dispatch {dispatch_id} is not queued, skipping the duplicate")
+            return
+        if dispatch_id is None:
+            await self._upload(user_id, contents_ids, torrent_id)
+            return
+        try:
+            succeeded = await self._upload(user_id, contents_ids, torrent_id)
+        except FloodWait:
+            await self._dispatch_svc.requeue(dispatch_id)  # Not the upload's fault; it's retried after the wait.
+            raise
+        except BaseException:
+            await self._dispatch_svc.finish(dispatch_id, False)
+            raise
+        await self._dispatch_svc.finish(dispatch_id, succeeded)
+
+    async def _upload(self, user_id: int, contents_ids: list[int], torrent_id: int) -> bool:
         user = await self._user_svc.get(user_id)
         torrent = await self._torrent_svc.get(torrent_id)
         contents = await self._content_svc.get_many_by_ids(contents_ids)
@@ -52,101 +86,162 @@ class Uploader:
                 await self._user_svc.set_user_blocked(user.id)
                 logger.debug(f"Sent unblocking message to user {user.id}")
             await bot_instance.send_message_to_get_acquainted(user.tg_id)
-            return
-        try:
-            if len(contents) > 1:
-                file_to_send = self._make_archive(contents, torrent.title)
-            else:
-                file_to_send = contents[0].save_path
-            if not file_to_send:
-                logger.error("[!] No file to send! {file_to_send}")
-                return
-        except IndexError:
-            logger.error("[!] IndexError! No file to send! {file_to_send}")
-            return
-        result = await self._send_file_to_user(file_to_send, user.tg_id)
+            return False
+        if not contents:
+            logger.error("[!] No contents to send!")
+            return False
+        cache_key = self._telegram_file_svc.cache_key(torrent, contents)
+        file_name = cache_key
+        result = await self._send_cached_file(cache_key, user.tg_id)
+        if result is None:
+            try:
+                if len(contents) > 1:
+                    file_to_send, file_name = await asyncio.to_thread(self._make_archive, contents, torrent)
+                else:
+                    file_to_send = contents[0].save_path
+                    file_name = os.path.basename(file_to_send or '')
+                if not file_to_send:
+                    logger.error("[!] No file to send! {file_to_send}")
+                    return False
+            except FileNotFoundError as e:
+                logger.error(f"! Uploader Error !: File {e.filename} not found!")
+                return False
+            result = await self._send_file_to_user(file_to_send, file_name, user.tg_id)
+            if result["success"]:
+                await self._telegram_file_svc.save(cache_key, result["file_id"], result["account_id"])
         if not result["success"]:
             if result["error_code"] == 1:
                 if not user.is_blocked:
                     await self._user_svc.set_user_blocked(user.id)
                     logger.debug(f"Sent unblocking message to user {user.id}")
                     await bot_instance.send_message_to_get_acquainted(user.tg_id)
-                    return
             if result["error_code"] == 2:
-                logger.error(f"[!] Uploader Error! Attempt to upload file {file_to_send} failed: return message is None!")
-                return
+                logger.error(f"[!] Uploader Error! Attempt to upload file {file_name} failed: return message is None!")
             if result["error_code"] == 3:
-                logger.error(f"! Uploader Error !: File {file_to_send} not found!")
-                return
+                logger.error(f"! Uploader Error !: File {file_name} not found!")
+            return False
         contents_to_delete = [content.id for content in contents]
         u_c_assoc_deleted = await self._user_content_svc.delete_associations(user.id, contents_to_delete)
         u_t_assoc_deleted = await self._user_torrent_svc.delete_association(user.id, torrent.id)
         user_torrent_associations = await self._user_torrent_svc.find_associations_by_torrent_id(torrent.id)
         if len(user_torrent_associations) < 2:
             torrent_updated = await self._torrent_svc.update_torrent({"is_processing": False}, torrent.id)
-            self._delete_permanently(torrent.hash)
+            self._torrent_cli.bind(torrent.hash, torrent.qbit_node)
+            await self._delete_permanently(torrent.hash)
             await self._content_svc.delete_by_torrent_id(torrent.id)
-        if len(contents) > 1:
-            self._delete_file(file_to_send)
+        return True
     
-    def _make_archive(self, contents: list[Content], torrent_title: str) -> str | None:
-        file_paths = [content.save_path for content in contents]
+    def _make_archive(self, contents: list[Content], torrent: Torrent) -> tuple[BinaryIO | None, str]:
+        """Open a zip of the contents, streamed to the upload as it's read (see `open_archive`).
+
+        Blocking: the compressible members are deflated here, so it's run in a thread.
+        """
+        torrent_title = torrent.title
         zip_filename = f"{torrent_title}.zip" if not torrent_title.lower().endswith('.zip') else torrent_title
         zip_filename = self._sanitize_filename(zip_filename)
-        base_dir = config.HOST_SAVEPATH
-        with zipfile.ZipFile(zip_filename, 'w') as zipf:
-            for file_path in file_paths:
-                if not file_path:
-                    print("No file path!")
-                    return
-                full_path = os.path.abspath(file_path)
-                arcname = os.path.relpath(full_path, base_dir)
-                zipf.write(full_path, arcname=arcname)
-        return os.path.abspath(zip_filename)
+        base_dir = config.host_savepath(torrent.qbit_node)
+        members = []
+        for content in contents:
+            if not content.save_path:
+                logger.error(f"[!] Uploader Error! No file path for content {content.id} of torrent {torrent.id}!")
+                return None, zip_filename
+            full_path = os.path.abspath(content.save_path)
+            members.append((full_path, os.path.relpath(full_path, base_dir)))
+        archive = open_archive(
+            members, zip_filename, config.archive_scratch_dir, config.ARCHIVE_WORKERS, config.ARCHIVE_DEFLATE_MAX_SIZE
+        )
+        return archive, zip_filename
 
-    async def _send_file_to_user(self, file_path: str, user_id: int) -> dict:
+    async def _send_file_to_user(self, file_to_send: str | BinaryIO, file_name: str, user_id: int) -> dict:
         try:
-            with open(file_path, "rb") as file:
+            with open(file_to_send, "rb") if isinstance(file_to_send, str) else file_to_send as file:
                 try:
-                    async with Client("/app/pyrogram_sessions/uploader", api_id=self._tg_api_id, api_hash=self._tg_api_hash) as app:
+                    async with self._telegram.client() as app:
                         message = await app.send_document(
                             chat_id=user_id,
                             document=file,
-                            file_name=os.path.basename(file_path),
+                            file_name=file_name,
                         )
-                        if not message:
-                            return {"success": False, "error": True, "error_code": "2"}
-                    return {"success": True, "error": False}
+                        if not message or not message.document:
+                            return {"success": False, "error": True, "error_code": 2}
+                    return {
+                        "success": True, "error": False, "file_id": message.document.file_id, "account_id": app.me.id
+                    }
                 except PeerIdInvalid:
-                    return {"success": False, "error": True, "error_code": "1"}
+                    return {"success": False, "error": True, "error_code": 1}
         except FileNotFoundError:
-            return {"success": False, "error": True, "error_code": "3"}
+            return {"success": False, "error": True, "error_code": 3}
+
+    async def _send_cached_file(self, cache_key: str, user_id: int) -> dict | None:
+        """Send the file uploaded before by its `file_id`. Return None if there's none to send."""
+        async with self._telegram.client() as app:
+            telegram_file = await self._telegram_file_svc.get(cache_key, app.me.id)
+            if telegram_file is None:
+                return None
+            try:
+                message = await app.send_cached_media(chat_id=user_id, file_id=telegram_file.file_id)
+            except PeerIdInvalid:
+                return {"success": False, "error": True, "error_code": 1}
+            except BadRequest as e:  # The file reference expired or the file is gone.
+                logger.warning(f"[!] UPLOADER: Cached file {cache_key} can't be sent, uploading it again: {e}")
+                await self._telegram_file_svc.invalidate(cache_key)
+                return None
+        if not message:
+            return {"success": False, "error": True, "error_code": 2}
+        logger.debug(f"[*] UPLOADER: Sent {cache_key} to {user_id} from the cache")
+        return {"success": True, "error": False}
     
     async def _is_peer_known(self, user_id: int) -> bool:
-        if user_id not in self._known_user_ids:
-            await self._load_known_peers()
-        return user_id in self._known_user_ids  # type: ignore
+        """Tell whether the uploader account can send to the user, cheapest check first.
+
+        The in-process set, then the persisted index, then resolving the single peer, and
+        only then the dialogs that appeared since the last scan.
+        """
+        if user_id in self._known_user_ids:
+            return True
+        async with self._telegram.client() as app:
+            account_id = app.me.id
+            if await self._known_peer_svc.is_known(account_id, user_id):
+                self._known_user_ids.add(user_id)
+                return True
+            try:
+                await app.resolve_peer(user_id)
+            except (PeerIdInvalid, KeyError, ValueError):
+                pass
+            else:
+                await self._known_peer_svc.save(account_id, user_id)
+                self._known_user_ids.add(user_id)
+                return True
+            await self._load_known_peers(app, account_id)
+        return user_id in self._known_user_ids
+
+    async def _load_known_peers(self, app: Client, account_id: int) -> None:
+        """Index the private dialogs of the account, stopping at the ones seen by the previous scan.
+
+        Dialogs come newest first, apart from the pinned ones, so the scan stops at the first
+        unpinned dialog not newer than the stored offset.
+        """
+        offset = await self._known_peer_svc.get_scan_offset(account_id)
+        peers, scanned, saved = dict(), 0, 0
+        async for dialog in app.get_dialogs():
+            scanned += 1
+            dialog_date = dialog.top_message.date if dialog.top_message else None
+            if offset and dialog_date and dialog_date <= offset and not dialog.is_pinned:
+                break
+            if dialog.chat.type.value == "private":
+                peers[dialog.chat.id] = dialog_date
+                self._known_user_ids.add(dialog.chat.id)
+            if len(peers) >= PEERS_BATCH_SIZE:
+                saved += await self._known_peer_svc.save_from_dialogs(account_id, peers)
+                peers = dict()
+        saved += await self._known_peer_svc.save_from_dialogs(account_id, peers)
+        logger.info(f"[*] UPLOADER: Scanned {scanned} dialogs since {offset}, indexed {saved} peers")
 
-    async def _load_known_peers(self) -> None:
-        """Загрузить список известных пользователей (peer'ов)"""
-        async with Client("/app/pyrogram_sessions/uploader", api_id=self._tg_api_id, api_hash=self._tg_api_hash) as app:
-            # Сохраняем только ID пользователей из личных чатов
-            async for dialog in app.get_dialogs():
-                if dialog.chat.type.value == "private":
-                    self._known_user_ids.add(dialog.chat.id)
-                if not self._known_user_ids:
-                    self._known_user_ids = {1}  # на случай, если нет личных чатов
-    
     @staticmethod
     def _sanitize_filename(name: str) -> str:
         return re.sub(r'[\\/:"*?<>|]+', "_", name)
     
-    @staticmethod
-    def _delete_file(file_path: str) -> None:
-        os.remove(file_path)
-
-    @with_relogin
-    def _delete_permanently(self, torrent_hash: str) -> None:
-        return self._torrent_cli.delete_permanently(torrent_hash)
+    async def _delete_permanently(self, torrent_hash: str) -> None:
+        return await self._torrent_cli.delete_permanently(torrent_hash)
 
 uploader = Uploader()
@@ -0,0 +1,37 @@
+from typing import Iterable, Protocol
+
+
+class IndexedContent(Protocol):
+    id: int
+    index: int
+    torrent_id: int
+
+
+def index_selections(
+    selections: Iterable[tuple[int, IndexedContent]],
+) -> dict[tuple[int, int], dict[int, IndexedContent]]:
+    """Group (user_id, content) pairs by (user_id, torrent_id), keyed by the file index."""
+    indexed = dict()
+    for user_id, content in selections:
+        indexed.setdefault((user_id, content.torrent_id), dict())[content.index] = content
+    return indexed
+
+
+def completed_files(torrent_files: Iterable[dict]) -> dict[int, dict]:
+    """Map indexes of the fully downloaded files to the files themselves."""
+    return {file['index']: file for file in torrent_files if file['progress'] >= 1}
+
+
+def match_completed(
+    completed: dict[int, dict], selection: dict[int, IndexedContent]
+) -> list[tuple[dict, IndexedContent]]:
+    """Pair the completed files with the selected contents, ordered by file index.
+
+    The smaller of the two maps is iterated, so the cost is O(min(completed, selected)).
+    """
+    if len(selection) <= len(completed):
+        pairs = [(completed[index], content) for index, content in selection.items() if index in completed]
+    else:
+        pairs = [(file, selection[index]) for index, file in completed.items() if index in selection]
+    pairs.sort(key=lambda pair: pair[0]['index'])
+    return pairs
@@ -0,0 +1,82 @@
+"""Completion notifications from qBittorrent.
+
+qBittorrent runs an external program when a torrent finishes. Point it at this hook and the
+upload is dispatched right away instead of waiting for the next watchdog sweep:
+
+    Tools > Options > Downloads > Run external program on torrent finished:
+    curl -fsS -X POST http://completion-hook:8099/torrents/%I/finished
+
+The same can be done without HTTP where the app code is installed next to qBittorrent:
+
+    python -m app.watchdog.hook notify %I
+"""
+import argparse
+import asyncio
+import re
+
+from loguru import logger
+
+from app.celery_queue import celery_app
+from app.config import config
+
+WATCH_TORRENTS_TASK = "app.tasks.tasks.watch_torrents_task"
+FINISHED_PATH = re.compile(r"/torrents/([0-9a-fA-F]{40})/finished/?")
+
+
+def notify(info_hash: str) -> None:
+    # Sent by name, so the hook doesn't import the watchdog with all its dependencies.
+    celery_app.send_task(WATCH_TORRENTS_TASK, args=[[info_hash.lower()]])
+    logger.info(f"[*] COMPLETION HOOK: Torrent {info_hash} finished, check enqueued")
+
+
+class CompletionHook:
+    """A minimal HTTP listener accepting `POST /torrents/<info hash>/finished`."""
+
+    def __init__(self, host: str = config.COMPLETION_HOOK_HOST, port: int = config.COMPLETION_HOOK_PORT):
+        self._host = host
+        self._port = port
+
+    async def serve(self) -> None:
+        server = await asyncio.start_server(self._handle, self._host, self._port)
+        logger.info(f"[*] COMPLETION HOOK: Listening on {self._host}:{self._port}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        status = "400 Bad Request"
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=10)
+            while (await asyncio.wait_for(reader.readline(), timeout=10)) not in (b"\r\n", b"\n", b""):
+                pass  # Headers aren't needed.
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            match = FINISHED_PATH.fullmatch(path)
+            if method != "POST" or not match:
+                status = "404 Not Found"
+            else:
+                await asyncio.to_thread(notify, match.group(1))
+                status = "202 Accepted"
+        except (asyncio.TimeoutError, ValueError):
+            pass
+        except Exception as e:
+            logger.error(f"[!] COMPLETION HOOK: Failed to handle the notification: {e}")
+            status = "500 Internal Server Error"
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        writer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("serve", help="Listen for notifications over HTTP (default)")
+    notify_parser = subparsers.add_parser("notify", help="Enqueue the check of one finished torrent")
+    notify_parser.add_argument("info_hash")
+    args = parser.parse_args()
+    if args.command == "notify":
+        notify(args.info_hash)
+    else:
+        asyncio.run(CompletionHook().serve())
+
+
+if __name__ == "__main__":
+    main()
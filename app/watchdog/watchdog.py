@@ -1,84 +1,228 @@
+import asyncio
+import time
+from collections import defaultdict
+
 from loguru import logger
 
 from app.bot.bot import bot_instance
-from app.torrent_client.qbittorrent import TorrentClient, torrent_client, with_relogin
+from app.common.lease import AdvisoryLock
+from app.torrent_client.pool import TorrentClientPool, torrent_client_pool
+from app.torrent_client.sync import TorrentsMirror, torrents_mirror
+from app.watchdog.completion import completed_files, index_selections, match_completed
 from app.entities.torrent.service import TorrentService, torrent_service
 from app.entities.content.service import ContentService, content_service
-from app.entities.user.service import (
-    UserContentService, UserService, UserTorrentService,
-    user_content_service, user_service, user_torrent_service
-)
+from app.entities.upload.service import UploadDispatchService, upload_dispatch_service
+from app.entities.user.service import UserContentService, UserService, user_content_service, user_service
 from app.config import config
+from app.models import Content, Torrent, User
 from app.tasks.upload_task import upload_downloaded_contents
 
+ETA_INFINITY = 8640000  # qBittorrent's ETA of a torrent that isn't going anywhere.
+
 
 class Watchdog:
     def __init__(
         self,
-        torrent_client: TorrentClient = torrent_client,
+        torrent_client: TorrentClientPool = torrent_client_pool,
         torrent_service: TorrentService = torrent_service,
         content_service: ContentService = content_service,
         user_content_service: UserContentService = user_content_service,
         user_service: UserService = user_service,
-        user_torrent_service: UserTorrentService = user_torrent_service,
+        torrents_mirror: TorrentsMirror = torrents_mirror,
+        upload_dispatch_service: UploadDispatchService = upload_dispatch_service,
+        lock: AdvisoryLock | None = None,
     ):
         self._torrent_cli = torrent_client
         self._torrent_svc = torrent_service
         self._content_svc = content_service
         self._user_content_svc = user_content_service
         self._user_svc = user_service
-        self._user_torrent_svc = user_torrent_service
-        self._savepath = config.HOST_SAVEPATH
-
-    async def __call__(self):
-        torrents_to_watch = await self._torrent_svc.get_many({'is_processing': True})
-        for torrent in torrents_to_watch:
-            user_torrent_associations = await self._user_torrent_svc.find_associations_by_torrent_id(torrent.id)
-            contents = await self._content_svc.get_by_torrent_id(torrent.id)
-            torrent_files = self._get_torrent_files(torrent.hash)
-            if not torrent_files:
+        self._torrents_mirror = torrents_mirror
+        self._dispatch_svc = upload_dispatch_service
+        self._lock = lock or AdvisoryLock('watchdog')
+        self._sync_mode = config.WATCHDOG_SYNC_MODE
+        self._concurrency = config.WATCHDOG_CONCURRENCY
+        self._min_interval = config.WATCHDOG_TICK_INTERVAL
+        self._max_interval = config.WATCHDOG_SWEEP_INTERVAL
+        self._partial_interval = config.WATCHDOG_PARTIAL_INTERVAL
+        self._next_check_at: dict[str, float] = dict()
+        self._state_loaded_at = float('-inf')
+
+    async def __call__(self, info_hashes: list[str] | None = None):
+        """Check the torrents being downloaded for completed files and dispatch their uploads.
+
+        Given `info_hashes` (a qBittorrent completion notification), only those torrents are
+        checked, and checked unconditionally. Otherwise it's a sweep over all of them.
+
+        One check runs at a time across all the workers, under a Postgres advisory lock.
+        A sweep finding the lock taken is skipped; a notified check waits for it.
+        """
+        async with self._lock.hold(wait=info_hashes is not None) as acquired:
+            if not acquired:
+                logger.info("[*] WATCHDOG: Another check is running, tick skipped")
+                return
+            await self._check(info_hashes)
+
+    async def _check(self, info_hashes: list[str] | None) -> None:
+        started_at = time.perf_counter()
+        now = time.monotonic()
+        forced = info_hashes is not None
+        changed_hashes = None
+        if forced:
+            info_hashes = [info_hash.lower() for info_hash in info_hashes]
+        elif self._sync_mode:
+            changed_hashes = await self._torrents_mirror.refresh()
+            if changed_hashes is not None and not self._anything_due(changed_hashes, now):
+                logger.debug("[*] WATCHDOG: No torrents due on this tick")
+                return
+        # The whole state to watch is loaded in two queries, however many torrents are downloading.
+        torrents, torrent_users = dict(), defaultdict(list)
+        for torrent, user in await self._torrent_svc.get_processing_with_users(info_hashes):
+            torrents.setdefault(torrent.id, torrent)
+            torrent_users[torrent.id].append(user)
+        selected_contents = index_selections(
+            await self._user_content_svc.find_selected_contents(list(torrents))
+        )
+        for torrent in torrents.values():
+            self._torrent_cli.bind(torrent.hash, torrent.qbit_node)
+        if forced:
+            to_check = list(torrents.values())
+        else:
+            self._state_loaded_at = now
+            watched_hashes = {torrent.hash for torrent in torrents.values()}
+            for info_hash in self._next_check_at.keys() - watched_hashes:  # Done with, or deleted elsewhere.
+                self._torrent_cli.unbind(info_hash)
+            self._next_check_at = {
+                info_hash: at for info_hash, at in self._next_check_at.items() if info_hash in watched_hashes
+            }
+            to_check = [torrent for torrent in torrents.values() if self._is_due(torrent.hash, changed_hashes, now)]
+        pending_contents = await self._dispatch_svc.get_pending_contents_ids([torrent.id for torrent in to_check])
+        loaded_at = time.perf_counter()
+        for torrent in to_check:
+            self._next_check_at[torrent.hash] = now + self._check_delay(torrent.hash)
+        semaphore = asyncio.Semaphore(self._concurrency)
+        notified_user_ids = set()
+
+        async def check(torrent: Torrent) -> bool:
+            async with semaphore:
+                try:
+                    partial = await self._check_torrent(
+                        torrent, torrent_users[torrent.id], selected_contents, pending_contents, notified_user_ids
+                    )
+                    if partial:
+                        self._next_check_at[torrent.hash] = min(
+                            self._next_check_at[torrent.hash], now + self._partial_interval
+                        )
+                    return True
+                except Exception as e:
+                    logger.exception(f"[!] WATCHDOG: Failed to check torrent {torrent.id}: {e}")
+                    self._next_check_at.pop(torrent.hash, None)  # Retry on the next tick.
+                    return False
+
+        results = await asyncio.gather(*(check(torrent) for torrent in to_check))
+        finished_at = time.perf_counter()
+        logger.info(
+            f"[*] WATCHDOG: {'Notified check' if forced else 'Tick'} took {finished_at - started_at:.2f} s "
+            f"(state loaded in {loaded_at - started_at:.2f} s): {len(torrents)} torrents watched, "
+            f"{len(to_check)} checked, {results.count(False)} failed, concurrency {self._concurrency}"
+        )
+
+    async def _check_torrent(
+        self,
+        torrent: Torrent,
+        users: list[User],
+        selected_contents: dict[tuple[int, int], dict[int, Content]],
+        pending_contents: dict[tuple[int, int], set[int]],
+        notified_user_ids: set[int],
+    ) -> bool:
+        """Dispatch the uploads of the completed files; return whether several selected files are incomplete."""
+        torrent_files = await self._get_torrent_files(torrent.hash)
+        if not torrent_files:
+            return False
+        completed = completed_files(torrent_files)
+        selected_indexes = set()
+        for user in users:
+            selected_indexes.update(selected_contents.get((user.id, torrent.id), ()))
+        users_ready_contents = dict()
+        save_paths = dict()  # Contents shared by several users are updated once.
+        for user in users:
+            user_id = user.id
+            if user.is_blocked:
+                if not (user.is_unblocking_message_sent or user_id in notified_user_ids):  # type: ignore
+                    notified_user_ids.add(user_id)
+                    await bot_instance.send_message_to_get_acquainted(user.tg_id)
+                    await self._user_svc.set_user_is_unblocking_message_sent(user.id)
+                    logger.debug(f"Sent unblocking message to user {user_id}")
                 continue
-            for assoc in user_torrent_associations:
-                user_id = assoc["user_id"]
-                user = await self._user_svc.get(user_id)
-                if user.is_blocked:
-                    if not user.is_unblocking_message_sent:  # type: ignore
-                        await bot_instance.send_message_to_get_acquainted(user.tg_id)
-                        user = await self._user_svc.set_user_is_unblocking_message_sent(user.id)
-                        logger.debug(f"Sent unblocking message to user {user_id}")
-                        continue
-                    if user.is_unblocking_message_sent:
-                        continue
-                user_content_associations = await self._user_content_svc.find_associations_by_user_id(user_id)
-                user_selected_contents_ids = [assoc["content_id"] for assoc in user_content_associations]
-                user_selected_contents = [content for content in contents if content.id in user_selected_contents_ids]
-                ready_files_counter = int()
-                ready_contents = []
-                for file in torrent_files:
-                    if file['progress'] >= 1:
-                        content_ = [
-                            content for content in contents if content in user_selected_contents and content.index == file['index']
-                        ]
-                        if not content_:
-                            continue
-                        content = content_[0]
-                        ready_content = content
-                        if not all((content.save_path, content.ready)):
-                            file_path = f'{self._savepath}/{file["name"]}'
-                            ready_content = await self._content_svc.update(
-                                {'save_path': file_path, 'ready': True}, torrent.id, file['index']
-                            )
-                        ready_contents.append(ready_content.id)
-                        logger.debug(f'Content downloaded: id {ready_content.id}, save_path {ready_content.save_path}')
-                        ready_files_counter += 1
-                if not ready_files_counter == len(ready_contents):
+            user_selection = selected_contents.get((user_id, torrent.id), {})
+            pending = pending_contents.get((user_id, torrent.id), set())
+            ready_contents = []
+            for file, content in match_completed(completed, user_selection):
+                if content.id in pending:  # Already on its way to the user.
                     continue
-                if ready_contents:
-                    upload_downloaded_contents.delay(user_id, ready_contents, torrent.id)
+                if not all((content.save_path, content.ready)):
+                    save_paths[content.index] = f'{config.host_savepath(torrent.qbit_node)}/{file["name"]}'
+                ready_contents.append(content)
+            users_ready_contents[user_id] = ready_contents
+        if save_paths:
+            # One statement however many files have completed since the last check.
+            for content in await self._content_svc.mark_ready(torrent.id, save_paths):
+                logger.debug(f'Content downloaded: id {content.id}, save_path {content.save_path}')
+        for user_id, ready_contents in users_ready_contents.items():
+            if ready_contents:
+                payload_size = sum(content.size for content in ready_contents)
+                dispatch = await self._dispatch_svc.claim(
+                    user_id, torrent.id, [content.id for content in ready_contents], payload_size
+                )
+                if dispatch is not None:
+                    upload_downloaded_contents.delay(user_id, dispatch.contents_ids, torrent.id, dispatch.id)
+        # The ETA is that of the last file; with several left, the others may complete well before it.
+        return len(selected_indexes - completed.keys()) > 1
+
+    def _anything_due(self, changed_hashes: set[str], now: float) -> bool:
+        """Decide without touching the database whether the state has to be loaded on this tick.
+
+        It has when a torrent is due, has just completed or isn't scheduled yet (a new one),
+        and at least once per sweep interval to pick up changes made in the database only.
+        """
+        if now - self._state_loaded_at >= self._max_interval:
+            return True
+        if any(info_hash not in self._next_check_at or self._is_completed(info_hash) for info_hash in changed_hashes):
+            return True
+        return any(at <= now for at in self._next_check_at.values())
+
+    def _is_due(self, torrent_hash: str, changed_hashes: set[str] | None, now: float) -> bool:
+        """Decide whether the per-file list of the torrent has to be fetched on this tick."""
+        next_check_at = self._next_check_at.get(torrent_hash)
+        if next_check_at is None or next_check_at <= now:
+            return True
+        return changed_hashes is not None and torrent_hash in changed_hashes and self._is_completed(torrent_hash)
+
+    def _is_completed(self, torrent_hash: str) -> bool:
+        progress = self._torrents_mirror.progress(torrent_hash)
+        return progress is not None and progress >= 1
+
+    def _check_delay(self, torrent_hash: str) -> float:
+        """Seconds until the next check of the torrent, derived from its ETA.
+
+        The torrent is checked again halfway to its ETA, so the checks get denser as it nears
+        completion. Stalled and completed torrents (the latter wait for their uploads) are
+        checked once per sweep interval. Without the mirror state there's no ETA to go by, and the
+        torrent is checked once per partial interval, as is one with several selected files left
+        (see `_check`).
+        """
+        state = self._torrents_mirror.state(torrent_hash) if self._sync_mode else None
+        if not state:
+            return self._partial_interval
+        if state.get('progress', 0) >= 1:
+            return self._max_interval
+        eta, dlspeed = state.get('eta', ETA_INFINITY), state.get('dlspeed', 0)
+        if dlspeed <= 0 or eta >= ETA_INFINITY:
+            return self._max_interval
+        return min(max(eta / 2, self._min_interval), self._max_interval)
 
-    @with_relogin
-    def _get_torrent_files(self, torrent_hash: str) -> dict:
-        return self._torrent_cli.get_torrent_files(torrent_hash)
+    async def _get_torrent_files(self, torrent_hash: str) -> list[dict]:
+        return await self._torrent_cli.get_torrent_files(torrent_hash)
 
 
 watch_for_downloads = Watchdog()
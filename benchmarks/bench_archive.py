@@ -0,0 +1,92 @@
+"""Throughput of building and reading an upload archive, by mode.
+
+The legacy mode writes the whole zip to disk and reads it back; the streamed modes produce
+it while it's read, with compressible members deflated by a thread pool beforehand. Run from
+the repository root:
+
+    python -m benchmarks.bench_archive [--media 4] [--media-size 256] [--subtitles 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+import zipfile
+
+from loguru import logger
+
+from app.uploader.archive import open_archive
+
+READ_SIZE = 512 * 1024  # Pyrogram's upload part size.
+
+
+def make_files(directory: str, media: int, media_size: int, subtitles: int) -> list[tuple[str, str]]:
+    members = []
+    for i in range(media):
+        path = os.path.join(directory, f'Episode {i:02d}.mkv')
+        with open(path, 'wb') as file:
+            for _ in range(media_size):
+                file.write(os.urandom(2 ** 20))
+        members.append((path, os.path.basename(path)))
+    for i in range(subtitles):
+        path = os.path.join(directory, f'Episode {i:02d}.srt')
+        with open(path, 'w') as file:
+            for line in range(2000):
+                file.write(f'{line}\n00:{line // 60:02d}:{line % 60:02d},000 --> 00:00:01,000\nSome dialogue line {line}\n\n')
+        members.append((path, os.path.basename(path)))
+    return members
+
+
+def drain(archive) -> int:
+    size = 0
+    while chunk := archive.read(READ_SIZE):
+        size += len(chunk)
+    archive.close()
+    return size
+
+
+def legacy(members: list[tuple[str, str]], directory: str) -> int:
+    path = os.path.join(directory, 'legacy.zip')
+    with zipfile.ZipFile(path, 'w') as archive:
+        for file_path, arcname in members:
+            archive.write(file_path, arcname=arcname)
+    size = drain(open(path, 'rb'))
+    os.remove(path)
+    return size
+
+
+def streamed(members: list[tuple[str, str]], directory: str, workers: int, deflate: bool) -> int:
+    archive = open_archive(members, 'streamed.zip', directory, workers, 64 * 2 ** 20 if deflate else -1)
+    return drain(archive)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--media', type=int, default=4)
+    parser.add_argument('--media-size', type=int, default=256, help='MB per media file')
+    parser.add_argument('--subtitles', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+    logger.disable('app')
+
+    with tempfile.TemporaryDirectory() as directory:
+        members = make_files(directory, args.media, args.media_size, args.subtitles)
+        files_size = sum(os.path.getsize(path) for path, _ in members)
+        modes = [
+            ('legacy (zip on disk, stored)', lambda: legacy(members, directory)),
+            ('streamed, stored', lambda: streamed(members, directory, 1, deflate=False)),
+            ('streamed, deflated, 1 thread', lambda: streamed(members, directory, 1, deflate=True)),
+            (f'streamed, deflated, {args.workers} threads', lambda: streamed(members, directory, args.workers, True)),
+        ]
+        print(f'{len(members)} files, {files_size / 2 ** 20:.1f} MB')
+        for name, run in modes:
+            started = time.perf_counter()
+            archive_size = run()
+            elapsed = time.perf_counter() - started
+            print(
+                f'{name:>36}: {elapsed:6.2f} s, {files_size / 2 ** 20 / elapsed:8.1f} MB/s, '
+                f'archive {archive_size / 2 ** 20:.1f} MB'
+            )
+
+
+if __name__ == '__main__':
+    main()
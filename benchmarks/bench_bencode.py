@@ -0,0 +1,82 @@
+"""Compare the bencodepy decode/re-encode path with the lazy Metainfo reader.
+
+bencodepy is in the optional `bench` dependency group (`poetry install --with bench`). Run from
+the repository root:
+
+    python -m benchmarks.bench_bencode [--pieces 2500000] [--files 20000] [--rounds 5]
+"""
+import argparse
+import hashlib
+import os
+import time
+import tracemalloc
+
+from app.bot.bencode import Metainfo, encode
+
+
+def make_torrent(pieces: int, files: int) -> bytes:
+    info = {
+        "name": "Synthetic season pack",
+        "piece length": 4 * 1024 * 1024,
+        "pieces": os.urandom(20 * pieces),
+        "files": [
+            {"length": 1024 * 1024 * (i % 700 + 1), "path": [f"Season {i // 1000 + 1}", f"Episode {i:05d}.mkv"]}
+            for i in range(files)
+        ],
+    }
+    return encode({
+        "announce": "udp://tracker.example.org:1337/announce",
+        "announce-list": [["udp://tracker.example.org:1337/announce"], ["udp://tracker.example.com:6969/announce"]],
+        "info": info,
+    })
+
+
+def bencodepy_path(raw: bytes) -> tuple[str, int]:
+    import bencodepy
+
+    torrent_data = bencodepy.decode(raw)
+    info = torrent_data[b"info"]
+    info_hash = hashlib.sha1(bencodepy.encode(info)).hexdigest()
+    return info_hash, len(info[b"files"])
+
+
+def metainfo_path(raw: bytes) -> tuple[str, int]:
+    metainfo = Metainfo(raw)
+    return metainfo.info_hash, sum(1 for _ in metainfo.iter_files())
+
+
+def measure(func, raw: bytes, rounds: int) -> tuple[float, float]:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func(raw)
+    elapsed = (time.perf_counter() - started) / rounds
+    tracemalloc.start()
+    func(raw)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pieces", type=int, default=2_500_000)
+    parser.add_argument("--files", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    raw = make_torrent(args.pieces, args.files)
+    print(f"Torrent: {len(raw) / 2 ** 20:.1f} MiB, {args.pieces} pieces, {args.files} files")
+    paths = {"metainfo": metainfo_path}
+    try:
+        import bencodepy  # noqa: F401
+        paths["bencodepy"] = bencodepy_path
+        assert bencodepy_path(raw) == metainfo_path(raw)
+    except ImportError:
+        print("bencodepy is not installed, measuring the Metainfo reader only")
+    for label, func in paths.items():
+        elapsed, peak = measure(func, raw, args.rounds)
+        print(f"{label:>10}: {elapsed * 1000:9.1f} ms/torrent, peak {peak / 2 ** 20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
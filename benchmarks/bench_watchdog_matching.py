@@ -0,0 +1,86 @@
+"""Per-tick cost of matching completed torrent files with the users' selected contents.
+
+The legacy matcher scans every content for every completed file (and a list for every
+content), so it is cubic and only run on small torrents. Run from the repository root:
+
+    python -m benchmarks.bench_watchdog_matching [--files 10000] [--users 3]
+"""
+import argparse
+import time
+
+from app.watchdog.completion import completed_files, index_selections, match_completed
+
+TORRENT_ID = 1
+
+
+class FakeContent:
+    __slots__ = ('id', 'index', 'torrent_id')
+
+    def __init__(self, id: int, index: int, torrent_id: int):
+        self.id = id
+        self.index = index
+        self.torrent_id = torrent_id
+
+
+def make_torrent(files: int, users: int) -> tuple[list[dict], list[FakeContent], list[tuple[int, FakeContent]]]:
+    torrent_files = [
+        {'index': i, 'name': f'Pack/Episode {i:05d}.mkv', 'progress': 1 if i % 2 else 0.5} for i in range(files)
+    ]
+    contents = [FakeContent(i + 1, i, TORRENT_ID) for i in range(files)]
+    # Every user selects a different 90% of the files.
+    selections = [
+        (user_id, content) for user_id in range(1, users + 1) for content in contents if content.index % 10 != user_id
+    ]
+    return torrent_files, contents, selections
+
+
+def legacy_tick(torrent_files, contents, selections, users: int) -> int:
+    matched = 0
+    for user_id in range(1, users + 1):
+        user_selected_contents_ids = [content.id for user_id_, content in selections if user_id_ == user_id]
+        user_selected_contents = [content for content in contents if content.id in user_selected_contents_ids]
+        for file in torrent_files:
+            if file['progress'] >= 1:
+                content_ = [
+                    content for content in contents if content in user_selected_contents and content.index == file['index']
+                ]
+                matched += bool(content_)
+    return matched
+
+
+def indexed_tick(torrent_files, contents, selections, users: int) -> int:
+    selected_contents = index_selections(selections)
+    completed = completed_files(torrent_files)
+    return sum(
+        len(match_completed(completed, selected_contents.get((user_id, TORRENT_ID), {})))
+        for user_id in range(1, users + 1)
+    )
+
+
+def measure(func, files: int, users: int) -> tuple[float, int]:
+    torrent = make_torrent(files, users)
+    started = time.perf_counter()
+    matched = func(*torrent, users)
+    return time.perf_counter() - started, matched
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=10_000)
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--legacy-max-files', type=int, default=400)
+    args = parser.parse_args()
+
+    sizes = sorted({100, 200, 400, 1_000, args.files})
+    for files in sizes:
+        elapsed, matched = measure(indexed_tick, files, args.users)
+        line = f'{files:>6} files: indexed {elapsed * 1000:9.2f} ms/tick ({matched} matches)'
+        if files <= args.legacy_max_files:
+            legacy_elapsed, legacy_matched = measure(legacy_tick, files, args.users)
+            assert legacy_matched == matched
+            line += f', legacy {legacy_elapsed * 1000:9.2f} ms/tick'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()